@@ -0,0 +1,216 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import jira_extract_final
+import run_metrics
+from dev_ranking_daily import DeveloperRanking
+from fake_jira_server import FakeJiraServer
+from synthetic_jira_data import generate_dataset
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Times and memory-profiles the ranking stages on synthetic data, and extraction against the fake JIRA server,
+# writing one JSON document per run so results can be compared across versions with --compare.
+
+def measure(fn, profile_memory=True):
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak_mb = None
+    if profile_memory:
+        # A second, traced run: tracemalloc slows Python-heavy code down, so it is kept out of the timing
+        tracemalloc.start()
+        fn()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+    return result, seconds, peak_mb
+
+def benchmark_ranking(data_dir, scale, mode, profile_memory, reference_limit):
+    compact = mode == 'compact'
+    # At least two workers so the sharded path is exercised on single-core machines too; tracemalloc only sees
+    # the parent process there, so its peak covers the merged partials and not the workers
+    workers = max(2, os.cpu_count() or 1) if mode == 'sharded' else None
+    results = []
+
+    def add_result(stage, seconds, peak_mb, rows):
+        results.append({
+            'benchmark': 'ranking', 'stage': stage, 'mode': mode, **scale,
+            'seconds': round(seconds, 4), 'peak_mb': None if peak_mb is None else round(peak_mb, 2), 'rows': rows,
+        })
+        logging.info(f"{mode:>9} {stage:<28} {seconds:8.3f}s" + (f" {peak_mb:9.1f} MB" if peak_mb is not None else ""))
+
+    def record(stage, fn, rows=None):
+        result, seconds, peak_mb = measure(fn, profile_memory)
+        add_result(stage, seconds, peak_mb, rows(result) if rows else None)
+        return result
+
+    # The constructor loads (or, sharded, aggregates) the data; its stages are read from the RunMetrics it records
+    # them in. Like measure, the memory peaks come from a second, traced construction.
+    def construct(metrics):
+        return DeveloperRanking(data_dir, compact=compact, workers=workers, metrics=metrics)
+
+    ranking = construct(run_metrics.RunMetrics('ranking'))
+    traced = None
+    if profile_memory:
+        traced = run_metrics.RunMetrics('ranking', trace_memory=True)
+        tracemalloc.start()
+        construct(traced)
+        tracemalloc.stop()
+    if mode == 'sharded':
+        stage_rows = {'aggregate_cube_sharded': len(ranking.developers)}
+    else:
+        stage_rows = {'load_all_issues': len(ranking.issues_data)}
+    stage_rows['get_developers'] = len(ranking.developers)
+    for stage, rows in stage_rows.items():
+        add_result(stage, ranking.metrics.stages[stage]['seconds'],
+                   traced.stages[stage].get('peak_mb') if traced is not None else None, rows)
+    record('rank_developers', ranking.rank_developers, lambda _: len(ranking.rankings))
+    if mode == 'default' and scale['issues'] <= reference_limit:
+        record('rank_developers_reference', lambda: ranking.rank_developers(vectorized=False),
+               lambda _: len(ranking.rankings))
+    return results
+
+def benchmark_extraction(work_dir, projects, issues_per_project, latency, profile_memory):
+    server = FakeJiraServer(projects=projects, issues_per_project=issues_per_project, latency=latency).start()
+    jira = jira_extract_final.JiraDataExtractor(server.base_url, 'benchmark', 'benchmark')
+    project_list = jira.get_all_projects()
+    start_dates = {project['key']: None for project in project_list}
+    scale = {'projects': projects, 'issues': projects * issues_per_project, 'latency': latency}
+    results = []
+    try:
+        for mode in ['sync', 'async', 'stream']:
+            args = argparse.Namespace(use_async=mode == 'async', max_connections=10, rate_limit=1000, format='csv',
+                                      worklogs=False)
+            output_dir = os.path.join(work_dir, f'extract_{mode}')
+
+            def run():
+                shutil.rmtree(output_dir, ignore_errors=True)
+                if mode == 'stream':
+                    failed = jira_extract_final.extract_streaming(jira, project_list, None, output_dir, args)
+                    if failed:
+                        raise RuntimeError(f"{mode} extraction failed for projects: {failed}")
+                    issue_count = sum(len(pd.read_csv(os.path.join(output_dir, f))) for f in os.listdir(output_dir))
+                else:
+                    issue_count = sum(len(p['issues'])
+                                      for p in jira_extract_final.fetch_projects(jira, project_list, start_dates, args))
+                # Extraction errors are logged and the project skipped, so a short count is the only sign of them
+                if issue_count != scale['issues']:
+                    raise RuntimeError(f"{mode} extraction returned {issue_count} of {scale['issues']} issues")
+                return issue_count
+
+            requests_before = server.request_count
+            issue_count, seconds, peak_mb = measure(run, profile_memory)
+            results.append({
+                'benchmark': 'extraction', 'stage': 'extract', 'mode': mode, **scale,
+                'seconds': round(seconds, 4), 'peak_mb': None if peak_mb is None else round(peak_mb, 2),
+                'rows': issue_count,
+                'requests': (server.request_count - requests_before) // (2 if profile_memory else 1),
+            })
+            logging.info(f"{mode:>9} extract {issue_count} issues {seconds:8.3f}s")
+    finally:
+        server.stop()
+    return results
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'platform': platform.platform(),
+    }
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    key = lambda r: (r['benchmark'], r['stage'], r['mode'], r.get('issues'), r.get('developers'), r.get('projects'))
+    previous = {key(r): r for r in baseline['results']}
+    for result in current['results']:
+        before = previous.get(key(result))
+        if before and before['seconds']:
+            ratio = result['seconds'] / before['seconds']
+            logging.info(f"{result['benchmark']}/{result['stage']}/{result['mode']} issues={result.get('issues')}: "
+                         f"{before['seconds']:.3f}s -> {result['seconds']:.3f}s ({ratio:.2f}x)")
+
+def parse_scale(value):
+    issues, developers = value.split(':')
+    return {'issues': int(float(issues)), 'developers': int(float(developers))}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction and ranking on synthetic JIRA data")
+    parser.add_argument('--scales', nargs='+', type=parse_scale, default=[parse_scale('10000:100'), parse_scale('100000:1000')],
+                        help="issues:developers pairs, e.g. 10000:100 1e6:1000 1e7:10000")
+    parser.add_argument('--projects', type=int, default=50)
+    parser.add_argument('--modes', nargs='+', choices=['default', 'compact', 'parquet', 'sharded'],
+                        default=['default', 'compact', 'parquet', 'sharded'])
+    parser.add_argument('--reference-limit', type=int, default=20000,
+                        help="Also time the per-developer reference path up to this many issues")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc runs")
+    parser.add_argument('--skip-extraction', action='store_true')
+    parser.add_argument('--extraction-projects', type=int, default=5)
+    parser.add_argument('--extraction-issues-per-project', type=int, default=1000)
+    parser.add_argument('--extraction-latency', type=float, default=0.05, help="Seconds the fake server waits per request")
+    parser.add_argument('--work-dir', default=None, help="Where to generate data (default: a temporary directory)")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', default=None, help="A previous results file to compare timings against")
+    args = parser.parse_args()
+
+    profile_memory = not args.no_memory
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='jira_benchmark_')
+    report = {**environment(), 'results': []}
+    try:
+        for scale in args.scales:
+            scale = {**scale, 'projects': args.projects}
+            storage_format = 'both' if 'parquet' in args.modes else 'csv'
+            data_dir = os.path.join(work_dir, f"issues_{scale['issues']}_{scale['developers']}")
+            csv_dir, parquet_dir = os.path.join(data_dir, 'csv'), os.path.join(data_dir, 'parquet')
+            if not os.path.exists(csv_dir):
+                _, seconds, _ = measure(lambda: generate_dataset(csv_dir, scale['issues'], scale['developers'],
+                                                                 args.projects, storage_format=storage_format), False)
+                report['results'].append({'benchmark': 'generate', 'stage': 'generate_dataset', 'mode': storage_format,
+                                          **scale, 'seconds': round(seconds, 4), 'peak_mb': None, 'rows': scale['issues']})
+                if storage_format == 'both':
+                    os.makedirs(parquet_dir)
+                    for filename in os.listdir(csv_dir):
+                        if filename.endswith('.parquet'):
+                            os.rename(os.path.join(csv_dir, filename), os.path.join(parquet_dir, filename))
+
+            for mode in args.modes:
+                mode_dir = parquet_dir if mode == 'parquet' else csv_dir
+                report['results'].extend(benchmark_ranking(mode_dir, scale, mode, profile_memory, args.reference_limit))
+
+        if not args.skip_extraction:
+            report['results'].extend(benchmark_extraction(work_dir, args.extraction_projects,
+                                                          args.extraction_issues_per_project,
+                                                          args.extraction_latency, profile_memory))
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    logging.info(f"Benchmark results saved to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import pandas as pd
+import os
+import json
+import hashlib
+import time
+import logging
+import threading
+import requests
+from datetime import datetime, timezone
+
+DEFAULT_RANKINGS_URL = "https://raw.githubusercontent.com/syedzaidi-kiwi/jira-developer-ranking/main/developer_rankings_final.csv"
+DEFAULT_CHECK_INTERVAL = 300
+
+class RankingsSnapshot:
+    # One version of the rankings CSV plus everything the dashboard charts derive from it. Built once per version
+    # and shared by every session, so widget interactions only slice precomputed, presorted data.
+    def __init__(self, df, version, generated_at):
+        df = df.copy()
+        # Convert 'TotalScore' to numeric, replacing any non-numeric values with NaN, and drop those rows
+        df['TotalScore'] = pd.to_numeric(df['TotalScore'], errors='coerce')
+        df = df.dropna(subset=['TotalScore'])
+
+        self.version = version
+        self.generated_at = generated_at
+        self.df = df.sort_values('TotalScore', ascending=False, kind='stable').reset_index(drop=True)
+        self.names = self.df['Name'].unique()
+        self.score_range = (float(self.df['TotalScore'].min()), float(self.df['TotalScore'].max())) if len(df) else (0.0, 0.0)
+        self.avg_completion_time = self.df.groupby('Name')['AvgCompletionTime'].mean().sort_values(ascending=False)
+        self.time_totals = self.df[['ProjectTime', 'BenchTime']].sum()
+
+    @property
+    def empty(self):
+        return self.df.empty
+
+    def is_unfiltered(self, developers, score_range):
+        return not developers and tuple(score_range) == self.score_range
+
+    def filter(self, developers=None, score_range=None):
+        if score_range is None or self.is_unfiltered(developers, score_range):
+            return self.df
+        filtered = self.df
+        if developers:
+            filtered = filtered[filtered['Name'].isin(developers)]
+        return filtered[(filtered['TotalScore'] >= score_range[0]) & (filtered['TotalScore'] <= score_range[1])]
+
+    def top(self, filtered, n=10):
+        # The snapshot is sorted by TotalScore, so every filtered view is too
+        return filtered.head(n)
+
+    def completion_times(self, filtered):
+        if len(filtered) == len(self.df):
+            return self.avg_completion_time
+        return self.avg_completion_time[self.avg_completion_time.index.isin(filtered['Name'])]
+
+    def time_distribution(self, filtered):
+        if len(filtered) == len(self.df):
+            return self.time_totals
+        return filtered[['ProjectTime', 'BenchTime']].sum()
+
+def rankings_metadata_path(output_file):
+    # Sidecar with the generation time of a rankings CSV; works for local paths and URLs alike. Defined here rather
+    # than in dev_ranking_daily, so the dashboard does not import the ranking engine.
+    return f"{os.path.splitext(output_file)[0]}.meta.json"
+
+def read_generated_at(metadata_text):
+    try:
+        return pd.Timestamp(json.loads(metadata_text)['generated_at']).to_pydatetime()
+    except (ValueError, KeyError, TypeError):
+        return None
+
+class LocalSnapshotSource:
+    def __init__(self, path):
+        self.path = path
+
+    def version(self):
+        stat = os.stat(self.path)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    def load(self):
+        version = self.version()
+        df = pd.read_csv(self.path)
+        generated_at = None
+        metadata_path = rankings_metadata_path(self.path)
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                generated_at = read_generated_at(f.read())
+        if generated_at is None:
+            generated_at = datetime.fromtimestamp(os.path.getmtime(self.path), tz=timezone.utc)
+        return df, version, generated_at
+
+class RemoteSnapshotSource:
+    # Conditional fetches: a copy of the last response and its validators are kept in cache_dir, and an unchanged
+    # file costs one 304 instead of a full download and re-parse
+    def __init__(self, url, cache_dir='.dashboard_cache', timeout=30):
+        self.url = url
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.body_path = os.path.join(cache_dir, 'rankings.csv')
+        self.headers_path = os.path.join(cache_dir, 'rankings.headers.json')
+
+    def cached_headers(self):
+        if not os.path.exists(self.headers_path) or not os.path.exists(self.body_path):
+            return {}
+        with open(self.headers_path) as f:
+            return json.load(f)
+
+    def fetch(self):
+        cached = self.cached_headers()
+        headers = {}
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        try:
+            response = self.session.get(self.url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                return cached
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if cached:
+                logging.warning(f"Could not refresh rankings from {self.url}, serving the cached copy: {str(e)}")
+                return cached
+            raise
+
+        generated_at = None
+        try:
+            metadata = self.session.get(rankings_metadata_path(self.url), timeout=self.timeout)
+            if metadata.ok:
+                generated_at = read_generated_at(metadata.text)
+        except requests.RequestException:
+            pass
+        if generated_at is None and response.headers.get('Last-Modified'):
+            generated_at = pd.Timestamp(response.headers['Last-Modified']).to_pydatetime()
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        # Written to temporary names and renamed, so a reader never sees a half-written copy
+        with open(f'{self.body_path}.tmp', 'w') as f:
+            f.write(response.text)
+        os.replace(f'{self.body_path}.tmp', self.body_path)
+        cached = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'generated_at': generated_at.isoformat() if generated_at else None,
+            'version': response.headers.get('ETag') or response.headers.get('Last-Modified') or hashlib.sha1(response.content).hexdigest(),
+        }
+        with open(f'{self.headers_path}.tmp', 'w') as f:
+            json.dump(cached, f)
+        os.replace(f'{self.headers_path}.tmp', self.headers_path)
+        return cached
+
+    def version(self):
+        return self.fetch()['version']
+
+    def load(self):
+        # version() has just revalidated the cached copy, so only fetch when there is none yet
+        cached = self.cached_headers() or self.fetch()
+        df = pd.read_csv(self.body_path)
+        generated_at = pd.Timestamp(cached['generated_at']).to_pydatetime() if cached.get('generated_at') else None
+        return df, cached['version'], generated_at
+
+class SnapshotStore:
+    # Process-wide holder of the current snapshot. The source is asked whether a new version exists at most once
+    # per check_interval; the snapshot (and its aggregates) is only rebuilt when the version changes. Once a snapshot
+    # is loaded, revalidation runs in one background thread and every viewer keeps getting the current snapshot
+    # meanwhile; only the first load and a forced refresh wait for the source, and only in the calling thread.
+    def __init__(self, source, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.source = source
+        self.check_interval = check_interval
+        self.snapshot = None
+        self.checked_at = 0
+        self.refreshing = False
+        # lock guards the fields above and is never held across a source call; refresh_lock lets one refresh
+        # talk to the source at a time
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+    def current(self, force=False):
+        with self.lock:
+            snapshot = self.snapshot
+            if snapshot is not None and not force:
+                if self.refreshing or time.monotonic() - self.checked_at < self.check_interval:
+                    return snapshot
+                self.refreshing = True
+        if snapshot is not None and not force:
+            threading.Thread(target=self.refresh_in_background, daemon=True).start()
+            return snapshot
+        return self.refresh(force)
+
+    def refresh(self, force=True):
+        with self.refresh_lock:
+            with self.lock:
+                snapshot = self.snapshot
+                if not force and snapshot is not None and time.monotonic() - self.checked_at < self.check_interval:
+                    # Loaded by a concurrent first viewer while this one waited
+                    return snapshot
+            version = self.source.version()
+            if snapshot is None or version != snapshot.version:
+                df, version, generated_at = self.source.load()
+                snapshot = RankingsSnapshot(df, version, generated_at)
+                logging.info(f"Loaded rankings snapshot {version} ({len(snapshot.df)} developers)")
+            with self.lock:
+                self.snapshot = snapshot
+                self.checked_at = time.monotonic()
+            return snapshot
+
+    def refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            logging.warning(f"Could not refresh the rankings snapshot, serving version {self.snapshot.version}: {str(e)}")
+            with self.lock:
+                self.checked_at = time.monotonic()
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+def source_from_env():
+    # RANKINGS_SNAPSHOT_PATH points at a local or mounted rankings CSV; otherwise the CSV is fetched from
+    # RANKINGS_URL (the repository copy by default)
+    path = os.getenv('RANKINGS_SNAPSHOT_PATH')
+    if path:
+        return LocalSnapshotSource(path)
+    return RemoteSnapshotSource(os.getenv('RANKINGS_URL', DEFAULT_RANKINGS_URL),
+                                cache_dir=os.getenv('RANKINGS_CACHE_DIR', '.dashboard_cache'))
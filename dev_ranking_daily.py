@@ -4,27 +4,447 @@ import numpy as np
 from datetime import datetime, timedelta
 import pytz
 import logging
+import argparse
+import json
+import issue_store
+import run_metrics
+from metric_registry import METRIC_REGISTRY, ScoreModel, load_plugins
+from dashboard_data import rankings_metadata_path
+from concurrent.futures import ProcessPoolExecutor
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+DEV_ISSUE_TYPES = ['Sub-task', 'Bug']
+NORMAL_PRIORITIES = ['Lowest', 'Low', 'Medium']
+CRITICAL_PRIORITIES = ['High']
+BLOCKER_PRIORITIES = ['Highest', 'Must Have']
+TOTAL_WORK_HOURS = 6 * 22 * 8
+DATE_COLUMNS = ['fields.created', 'fields.updated', 'fields.resolutiondate']
+
+# The six terms of the score, formulas over the metrics; --score-config can replace them or add more
+SCORE_TERMS = {
+    'SubtaskBugRatio': 'SubtaskTime / (BugTime + 1)',
+    'BugPenalty': '-(BugCount * 1 + CriticalBugCount * 2 + BlockerBugCount * 3)',
+    'CompletionTime': '(480 - min(AvgCompletionTime, 480)) / 48',
+    'DaysLogged': 'DaysLogged8Hours / 132',
+    'EstimationAccuracy': '2 - min(abs(1 - (EstimationAccuracy / 100)), 1)',
+    'ProjectBenchRatio': 'ProjectTime / (BenchTime + 1)',
+}
+
+# Multipliers of the score terms; calculate_scores accepts overrides for any of them
+SCORE_WEIGHTS = {
+    'SubtaskBugRatio': 10,
+    'BugPenalty': 1,
+    'CompletionTime': 10,
+    'DaysLogged': 100,
+    'EstimationAccuracy': 50,
+    'ProjectBenchRatio': 10,
+}
+SCORE_MODEL = ScoreModel(SCORE_TERMS, SCORE_WEIGHTS)
+
+# Breakdown levels of the aggregation cube; every cell holds the partials plus the total logged time
+CUBE_DIMENSIONS = ['Developer', 'Project', 'IssueType', 'Priority', 'Week']
+
+def parse_date(date_str):
+    try:
+        dt = pd.to_datetime(date_str, format='mixed')
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=pytz.UTC)
+        else:
+            dt = dt.astimezone(pytz.UTC)
+        return dt.replace(tzinfo=None)
+    except:
+        return pd.NaT
+
+def parse_dates(values):
+    # Vectorized equivalent of parse_date: naive timestamps are taken as UTC, aware ones are
+    # converted to UTC, and the result is returned as naive UTC with unparseable cells as NaT.
+    if pd.api.types.is_datetime64_dtype(values):
+        return values
+    return pd.to_datetime(values, format='mixed', utc=True, errors='coerce').dt.tz_localize(None)
+
+def normalize_dates(issues):
+    for col in DATE_COLUMNS:
+        if col in issues.columns:
+            issues[col] = parse_dates(issues[col])
+    return issues
+
+def developer_email(name):
+    return f"{name.lower().replace(' ', '.')}@kiwitech.com"
+
+def register_builtin_metrics(registry):
+    # Per-issue values shared by the partials below
+    registry.add_value('IsBug', ['fields.issuetype.name'], lambda v: v['fields.issuetype.name'] == 'Bug')
+    registry.add_value('IsSubtask', ['fields.issuetype.name'], lambda v: v['fields.issuetype.name'] == 'Sub-task')
+    registry.add_value('TimeSpent', ['fields.timespent'], lambda v: v['fields.timespent'].astype('float64'))
+    registry.add_value('CreatedDate', ['fields.created'], lambda v: parse_dates(v['fields.created']))
+    registry.add_value('ResolutionDate', ['fields.resolutiondate'], lambda v: parse_dates(v['fields.resolutiondate']))
+    registry.add_value('CompletionHours', [], lambda v: completion_hours(v['CreatedDate'], v['ResolutionDate']))
+    registry.add_value('AccuracyPercent', ['fields.timespent', 'fields.timeoriginalestimate'],
+                       lambda v: estimation_accuracy(v['TimeSpent'], v['fields.timeoriginalestimate']))
+
+    # Per-developer sums and counts; every metric is derived from these in finalize_metrics
+    registry.add_partial('IssueCount', [], lambda v: 1)
+    registry.add_partial('LoggedIssueCount', ['TimeSpent'], lambda v: (v['TimeSpent'] > 0).astype('int64'))
+    registry.add_partial('BugSeconds', ['TimeSpent', 'IsBug'], lambda v: v['TimeSpent'].where(v['IsBug'], 0).fillna(0))
+    registry.add_partial('SubtaskSeconds', ['TimeSpent', 'IsSubtask'],
+                         lambda v: v['TimeSpent'].where(v['IsSubtask'], 0).fillna(0))
+    for name, priorities in [('BugCount', NORMAL_PRIORITIES), ('CriticalBugCount', CRITICAL_PRIORITIES),
+                             ('BlockerBugCount', BLOCKER_PRIORITIES)]:
+        registry.add_partial(name, ['IsBug', 'fields.priority.name'],
+                             lambda v, priorities=priorities:
+                             (v['IsBug'] & v['fields.priority.name'].isin(priorities)).astype('int64'))
+    registry.add_partial('CompletionHoursSum', ['CompletionHours'], lambda v: v['CompletionHours'].fillna(0))
+    registry.add_partial('CompletionCount', ['CompletionHours'], lambda v: v['CompletionHours'].notna().astype('int64'))
+    registry.add_partial('AccuracySum', ['AccuracyPercent'], lambda v: v['AccuracyPercent'].fillna(0))
+    registry.add_partial('AccuracyCount', ['AccuracyPercent'],
+                         lambda v: v['AccuracyPercent'].notna().astype('int64'))
+
+    # Logged hours are shared by DaysLogged8Hours, ProjectTime and BenchTime
+    registry.add_metric('ProjectHours', ['BugSeconds', 'SubtaskSeconds'],
+                        lambda p, hours: (p['BugSeconds'] + p['SubtaskSeconds']) / 3600, hidden=True)
+    registry.add_metric('BugTime', ['BugSeconds'], lambda p, hours: (p['BugSeconds'] / 3600).round(2))
+    registry.add_metric('SubtaskTime', ['SubtaskSeconds'], lambda p, hours: (p['SubtaskSeconds'] / 3600).round(2))
+    registry.add_metric('BugCount', ['BugCount'], lambda p, hours: p['BugCount'])
+    registry.add_metric('CriticalBugCount', ['CriticalBugCount'], lambda p, hours: p['CriticalBugCount'])
+    registry.add_metric('BlockerBugCount', ['BlockerBugCount'], lambda p, hours: p['BlockerBugCount'])
+    registry.add_metric('AvgCompletionTime', ['CompletionHoursSum', 'CompletionCount'],
+                        lambda p, hours: mean_of(p['CompletionHoursSum'], p['CompletionCount']))
+    registry.add_metric('DaysLogged8Hours', ['ProjectHours'], lambda p, hours: (p['ProjectHours'] / 8).round(2))
+    registry.add_metric('EstimationAccuracy', ['AccuracySum', 'AccuracyCount'],
+                        lambda p, hours: mean_of(p['AccuracySum'], p['AccuracyCount']))
+    registry.add_metric('ProjectTime', ['ProjectHours'], lambda p, hours: p['ProjectHours'].round(2))
+    registry.add_metric('BenchTime', ['ProjectHours'],
+                        lambda p, hours: np.maximum(0, hours - p['ProjectHours']).round(2))
+
+def completion_hours(created_date, resolution_date):
+    completion_time = (resolution_date - created_date).dt.total_seconds() / 3600
+    return completion_time.where(completion_time >= 0)
+
+def estimation_accuracy(timespent, estimate):
+    accuracy = (timespent / estimate.astype('float64')) * 100
+    return accuracy.where(accuracy.notna() & (accuracy != np.inf))
+
+def mean_of(total, count):
+    return (total / count.where(count > 0)).fillna(0).round(2)
+
+# Metrics registered here (by plugins too, see load_plugins) are computed in the same pass as the built-in ones and
+# flow through the cube, windowed rankings, the metric state and the query service
+register_builtin_metrics(METRIC_REGISTRY)
+BUILTIN_METRIC_COLUMNS = METRIC_REGISTRY.metric_columns
+
+def cube_measures():
+    return METRIC_REGISTRY.partial_columns + ['TimeSpentSeconds']
+
+def issue_contributions(issues, issue_types=DEV_ISSUE_TYPES, worklogs=None):
+    # One row per Sub-task/Bug issue (or per issue of any type with issue_types=None) holding what that issue adds
+    # to its creator's partials, or to the partials of whoever logged work on it when worklogs are given
+    dev_issues = issues if issue_types is None else issues[issues['fields.issuetype.name'].isin(issue_types)]
+    values = METRIC_REGISTRY.issue_values(dev_issues)
+    dimensions = pd.DataFrame({
+        'Developer': dev_issues['fields.creator.displayName'],
+        'Project': dev_issues['fields.project.key'],
+        'IssueType': dev_issues['fields.issuetype.name'],
+        'Priority': dev_issues['fields.priority.name'],
+        'Created': values['CreatedDate'],
+    }, index=dev_issues.index)
+    contributions = pd.concat([dimensions, METRIC_REGISTRY.contributions(values)], axis=1)
+    contributions['TimeSpentSeconds'] = values['TimeSpent'].fillna(0)
+    if worklogs is not None:
+        contributions = attribute_worklogs(contributions, dev_issues, worklogs)
+    return contributions
+
+def attribute_worklogs(contributions, issues, worklogs):
+    # Each author of a worklog gets a copy of the issue's row carrying only the time they logged themselves; the
+    # counts, completion time and estimation accuracy stay those of the issue. Issues nobody logged work on stay
+    # with their creator. Rows keep the issue's index label, so they can still be joined back to the issue.
+    issue_ids = issues.loc[contributions.index, 'id'].astype(str)
+    logged = pd.DataFrame({
+        'issueId': worklogs['issueId'].astype(str),
+        'author': worklogs['author'],
+        'seconds': pd.to_numeric(worklogs['timeSpentSeconds'], errors='coerce').fillna(0),
+    })
+    logged = logged[logged['issueId'].isin(issue_ids) & logged['author'].notna()]
+    logged = logged.groupby(['issueId', 'author'], sort=False)['seconds'].sum().reset_index()
+
+    positions = pd.Series(np.arange(len(issue_ids)), index=issue_ids.to_numpy())
+    positions = positions[~positions.index.duplicated(keep='last')]
+    credited = contributions.iloc[positions.loc[logged['issueId']].to_numpy()].copy()
+    seconds = logged['seconds'].to_numpy()
+    credited['Developer'] = logged['author'].to_numpy()
+    credited['BugSeconds'] = np.where(credited['IssueType'] == 'Bug', seconds, 0)
+    credited['SubtaskSeconds'] = np.where(credited['IssueType'] == 'Sub-task', seconds, 0)
+    credited['TimeSpentSeconds'] = seconds
+    credited['LoggedIssueCount'] = (seconds > 0).astype('int64')
+
+    unlogged = contributions[~issue_ids.isin(logged['issueId']).to_numpy()]
+    contributions = pd.concat([unlogged.astype({'Developer': object}), credited.astype({'Developer': object})])
+    return contributions
+
+def aggregate_partials(issues, worklogs=None):
+    contributions = issue_contributions(issues, worklogs=worklogs)
+    partials = contributions.groupby('Developer', observed=True)[METRIC_REGISTRY.partial_columns].sum()
+    partials.index = partials.index.astype(object)
+    return partials
+
+def aggregate_project_partials(issues, worklogs=None):
+    # Partials per (developer, project); summing rows over any set of projects gives that subset's partials
+    contributions = issue_contributions(issues, worklogs=worklogs)
+    partials = contributions.groupby(['Developer', 'Project'], observed=True)[METRIC_REGISTRY.partial_columns].sum()
+    partials.index = pd.MultiIndex.from_arrays([partials.index.get_level_values(level).astype(object)
+                                                for level in range(2)], names=['Developer', 'Project'])
+    return partials
+
+def categorize_cube(cube):
+    for col in CUBE_DIMENSIONS[:-1]:
+        cube[col] = cube[col].astype('category')
+    return cube
+
+def build_cube(issues, worklogs=None):
+    # One grouped pass over every issue: the partials of each (developer, project, issue type, priority, week of
+    # creation) cell. Cells are sums and counts, so any coarser breakdown is a sum over cells.
+    contributions = issue_contributions(issues, issue_types=None, worklogs=worklogs)
+    created = contributions['Created']
+    contributions['Week'] = created.dt.normalize() - pd.to_timedelta(created.dt.dayofweek, unit='D')
+    cube = contributions.groupby(CUBE_DIMENSIONS, observed=True, dropna=False)[cube_measures()].sum().reset_index()
+    return categorize_cube(cube)
+
+def merge_cubes(cubes):
+    cubes = [cube for cube in cubes if not cube.empty]
+    if not cubes:
+        return categorize_cube(pd.DataFrame(columns=CUBE_DIMENSIONS + cube_measures()))
+    cube = pd.concat([cube.astype({col: object for col in CUBE_DIMENSIONS[:-1]}) for cube in cubes], ignore_index=True)
+    cube = cube.groupby(CUBE_DIMENSIONS, dropna=False)[cube_measures()].sum().reset_index()
+    return categorize_cube(cube)
+
+def cube_partials(cube):
+    # The per-developer partials the ranking uses: the Sub-task/Bug cells rolled up to developers
+    cells = cube[cube['IssueType'].isin(DEV_ISSUE_TYPES)]
+    partials = cells.groupby('Developer', observed=True)[METRIC_REGISTRY.partial_columns].sum()
+    partials.index = partials.index.astype(object)
+    return partials
+
+def rollup_cube(cube, by, **filters):
+    # Partials and metrics for any coarser breakdown, e.g. rollup_cube(cube, ['Project', 'Week'], IssueType='Bug').
+    # Filters take one value or a list of values per dimension.
+    for dim, values in filters.items():
+        values = values if isinstance(values, (list, tuple, set)) else [values]
+        cube = cube[cube[dim].isin(values)]
+    partials = cube.groupby(by, observed=True, dropna=False)[cube_measures()].sum()
+    metrics = finalize_metrics(partials)
+    return partials.join(metrics.drop(columns=[col for col in metrics.columns if col in partials.columns]))
+
+def save_cube(cube, path):
+    cube.to_parquet(f'{path}.tmp', index=False)
+    os.replace(f'{path}.tmp', path)
+    logging.info(f"Aggregation cube with {len(cube)} cells saved to {path}")
+
+def load_cube(path):
+    return categorize_cube(pd.read_parquet(path))
+
+def eligible_developers(partials):
+    # Same criteria as DeveloperRanking.get_developers: at least 5 Sub-task/Bug issues, some with logged time
+    return partials.index[(partials['IssueCount'] >= 5) & (partials['LoggedIssueCount'] > 0)].tolist()
+
+def finalize_metrics(partials, total_work_hours=TOTAL_WORK_HOURS):
+    return METRIC_REGISTRY.finalize(partials, total_work_hours)
+
+def window_work_hours(starts, ends):
+    # Working hours a developer could have spent in each [start, end) window: 8 hours per weekday, the same basis as
+    # TOTAL_WORK_HOURS (22 working days a month for 6 months)
+    starts = pd.DatetimeIndex(starts).values.astype('datetime64[D]')
+    ends = pd.DatetimeIndex(ends).values.astype('datetime64[D]')
+    return np.busday_count(starts, ends) * 8
+
+def rolling_windows(start, end, length, step):
+    # Anchored at end, so the latest window is always a full one; earlier windows go back in steps while they still
+    # start within the data
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    length, step = pd.Timedelta(length), pd.Timedelta(step)
+    starts = []
+    window_start = end - length
+    while window_start >= start or not starts:
+        starts.append(window_start)
+        window_start -= step
+    return [(s, s + length) for s in reversed(starts)]
+
+def windowed_partials(contributions, times, windows):
+    # Partials for every (window, developer) pair from a single pass over the contributions: each issue is counted
+    # in the bucket between two consecutive window boundaries, and a window's partials are the sum of the buckets
+    # it spans. Each window is summed over its own buckets rather than taken as a difference of running totals over
+    # the whole history, whose cancellation error could change the rounded metrics.
+    valid = times.notna().to_numpy()
+    contributions = contributions[valid]
+    times = times[valid].to_numpy(dtype='datetime64[ns]')
+    codes, developers = pd.factorize(contributions['Developer'].astype(object), sort=True)
+
+    starts = np.array([pd.Timestamp(s).to_datetime64() for s, _ in windows], dtype='datetime64[ns]')
+    ends = np.array([pd.Timestamp(e).to_datetime64() for _, e in windows], dtype='datetime64[ns]')
+    # reduceat would return a single bucket for an empty or reversed window instead of nothing
+    empty = ends <= starts
+    if empty.any():
+        raise ValueError(f"Windows must end after they start: {[windows[i] for i in np.flatnonzero(empty)]}")
+    boundaries = np.unique(np.concatenate([starts, ends]))
+    start_positions = np.searchsorted(boundaries, starts)
+    end_positions = np.searchsorted(boundaries, ends)
+    # Bucket k holds the issues in [boundaries[k - 1], boundaries[k]); bucket 0 and the last bucket are outside
+    # every window
+    buckets = np.searchsorted(boundaries, times, side='right')
+    cells = buckets * len(developers) + codes
+    shape = (len(boundaries) + 1, len(developers))
+    # A window spans buckets start_position + 1 to end_position; reduceat sums every other slice of these bounds
+    bounds = np.column_stack([start_positions + 1, end_positions + 1]).ravel()
+
+    partials = {}
+    for col in METRIC_REGISTRY.partial_columns:
+        sums = np.bincount(cells, weights=contributions[col].to_numpy(dtype='float64'),
+                           minlength=shape[0] * shape[1]).reshape(shape)
+        partials[col] = np.add.reduceat(sums, bounds, axis=0)[::2]
+
+    # Same eligibility as eligible_developers, per window
+    window_index, developer_index = np.nonzero((partials['IssueCount'] >= 5) & (partials['LoggedIssueCount'] > 0))
+    result = pd.DataFrame({col: values[window_index, developer_index] for col, values in partials.items()},
+                          index=pd.Index(developers[developer_index], name='Name', dtype=object))
+    for col in METRIC_REGISTRY.partial_columns:
+        if col.endswith('Count'):
+            result[col] = result[col].round().astype('int64')
+    result.insert(0, 'WindowStart', starts[window_index])
+    result.insert(1, 'WindowEnd', ends[window_index])
+    return result
+
+def load_issue_file(path, compact=False, cache_dir=None):
+    # Dates are parsed here, per file, so that the work is spread over the loader's processes
+    variant = 'compact' if compact else 'ranking'
+    cache = issue_store.ParsedFileCache(cache_dir) if cache_dir else None
+    entry = cache.entry_path(path, variant) if cache else None
+    table = issue_store.read_issue_file(path)
+    if compact:
+        frame = issue_store.to_compact_frame(table)
+    else:
+        frame = normalize_dates(issue_store.to_ranking_frame(table))
+    if cache:
+        cache.put(path, variant, frame, entry)
+    return frame
+
+def load_issue_files(paths, compact=False, workers=None, cache_dir=None):
+    # Cached files are read here; the others are parsed in parallel, one file per task. Returns the frames in the
+    # order of paths.
+    frames = {}
+    if cache_dir:
+        cache = issue_store.ParsedFileCache(cache_dir)
+        for path in paths:
+            frame = cache.get(path, 'compact' if compact else 'ranking')
+            if frame is not None:
+                frames[path] = frame
+    pending = [path for path in paths if path not in frames]
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = executor.map(load_issue_file, pending, [compact] * len(pending), [cache_dir] * len(pending))
+            frames.update(zip(pending, parsed))
+    else:
+        frames.update((path, load_issue_file(path, compact, cache_dir)) for path in pending)
+    logging.info(f"Parsed {len(pending)} issue files with {max(workers, 1)} worker(s), "
+                 f"{len(paths) - len(pending)} read from the cache")
+    return [frames[path] for path in paths]
+
+def aggregate_file_cube(path, compact=False, plugins=()):
+    load_plugins(METRIC_REGISTRY, plugins)
+    return build_cube(normalize_dates(load_issue_file(path, compact)))
+
+def aggregate_cube_sharded(paths, workers, compact=False):
+    # Map: each project file is aggregated into a cube in its own process. Reduce: cube cells are plain sums and
+    # counts, so the cells from every shard just add up. map() keeps the file order, so the float sums are reproducible.
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        shard_cubes = list(executor.map(aggregate_file_cube, paths, [compact] * len(paths),
+                                        [METRIC_REGISTRY.plugins] * len(paths)))
+    return merge_cubes(shard_cubes)
+
+def score_rankings(rankings, score_model, weights=None):
+    # Scores every row of a metrics frame at once; DeveloperRanking.calculate_scores and the query service use it
+    columns = score_model.columns
+    values = rankings[columns].apply(pd.to_numeric, errors='coerce')
+    v = {col: values[col].to_numpy(dtype='float64') for col in columns}
+    score, zero_division = score_model.evaluate(v, weights)
+
+    # Rows that make calculate_score raise (non-numeric values or a zero denominator) fall back to 0
+    non_numeric = (values.isna() & rankings[columns].notna()).any(axis=1).to_numpy()
+    bad_rows = non_numeric | zero_division
+    for position in np.flatnonzero(bad_rows):
+        reason = 'non-numeric metric value' if non_numeric[position] else 'float division by zero'
+        logging.error(f"Error calculating score for row: {rankings.iloc[position]}")
+        logging.error(f"Error message: {reason}")
+
+    # max(0, score) in calculate_score also maps NaN to 0
+    score = np.round(np.where(score > 0, score, 0), 2)
+    score[bad_rows] = 0
+    return pd.Series(score, index=rankings.index)
+
 class DeveloperRanking:
-    def __init__(self, data_dir):
+    def __init__(self, data_dir, compact=False, workers=None, metrics=None, load_workers=None, cache_dir=None,
+                 attribute_time='creator', score_model=None, database=None):
         self.data_dir = data_dir
-        self.issues_data = self.load_all_issues()
-        self.developers = self.get_developers()
+        self.database = database
+        self.compact = compact
+        self.score_model = score_model or SCORE_MODEL
+        self.load_workers = load_workers
+        self.cache_dir = cache_dir
+        self.partials = None
+        self.cube = None
+        self.metrics = metrics or run_metrics.RunMetrics('ranking')
+        self.worklogs = None
+        if attribute_time == 'worklog':
+            if workers and workers > 1:
+                raise ValueError("Worklog attribution needs the loaded issues and cannot be combined with --workers")
+            with self.metrics.stage('load_worklogs'):
+                self.worklogs = issue_store.read_table(issue_store.WORKLOG_TABLE, data_dir)
+            if self.worklogs is None:
+                raise FileNotFoundError(f"No worklogs found in {data_dir}; run the extractor with --worklogs")
+            self.metrics.add('worklogs', len(self.worklogs))
+        if workers and workers > 1:
+            # Sharded mode never holds the whole issue history in this process, only the merged cube
+            self.issues_data = None
+            with self.metrics.stage('aggregate_cube_sharded'):
+                self.cube = aggregate_cube_sharded(issue_store.list_issue_files(data_dir), workers, compact)
+                self.partials = cube_partials(self.cube)
+            with self.metrics.stage('get_developers'):
+                self.developers = eligible_developers(self.partials)
+        else:
+            with self.metrics.stage('load_all_issues'):
+                self.issues_data = self.load_all_issues()
+            with self.metrics.stage('get_developers'):
+                self.developers = self.get_developers()
+        self.metrics.add('developers', len(self.developers))
         self.rankings = pd.DataFrame()
 
     def load_all_issues(self):
-        all_issues = []
-        for filename in os.listdir(self.data_dir):
-            if filename.endswith('_issues.csv'):
-                df = pd.read_csv(os.path.join(self.data_dir, filename))
-                all_issues.append(df)
-        return pd.concat(all_issues, ignore_index=True)
+        if self.database is not None:
+            # One query against the indexed issues table instead of parsing every project file
+            table = self.database.read_issues()
+            all_issues = [issue_store.to_compact_frame(table) if self.compact else issue_store.to_ranking_frame(table)]
+        else:
+            all_issues = load_issue_files(issue_store.list_issue_files(self.data_dir), self.compact, self.load_workers,
+                                          self.cache_dir)
+        if self.compact:
+            issues = issue_store.concat_compact_frames(all_issues)
+        else:
+            issues = normalize_dates(pd.concat(all_issues, ignore_index=True))
+        memory_mb = issue_store.memory_usage_mb(issues)
+        logging.info(f"Loaded {len(issues)} issues using {memory_mb:.2f} MB")
+        self.metrics.add('issues', len(issues))
+        self.metrics.add('issue_table_mb', round(memory_mb, 2))
+        return issues
 
     def get_developers(self):
+        if self.worklogs is not None:
+            # Eligibility follows the attribution, so the partials (and the cube behind them) are built here
+            with self.metrics.stage('build_cube'):
+                self.cube = build_cube(self.issues_data, self.worklogs)
+            with self.metrics.stage('cube_partials'):
+                self.partials = cube_partials(self.cube)
+            return eligible_developers(self.partials)
         dev_issues = self.issues_data[self.issues_data['fields.issuetype.name'].isin(['Sub-task', 'Bug'])]
-        grouped = dev_issues.groupby('fields.creator.displayName')
+        grouped = dev_issues.groupby('fields.creator.displayName', observed=True)
         
         developers = []
         for name, group in grouped:
@@ -38,10 +458,28 @@ class DeveloperRanking:
         
         return developers
 
+    def calculate_all_metrics(self, state=None):
+        if state is not None:
+            with self.metrics.stage('finalize_metrics'):
+                metrics = state.metrics()
+        else:
+            partials = self.partials
+            if partials is None:
+                with self.metrics.stage('build_cube'):
+                    self.cube = build_cube(self.issues_data)
+                with self.metrics.stage('cube_partials'):
+                    partials = cube_partials(self.cube)
+            with self.metrics.stage('finalize_metrics'):
+                metrics = finalize_metrics(partials).reindex(self.developers)
+        metrics.index.name = 'Name'
+        metrics = metrics.reset_index()
+        metrics.insert(1, 'Email', metrics['Name'].map(developer_email))
+        return metrics
+
     def calculate_time_spent(self, developer):
         dev_issues = self.issues_data[
             (self.issues_data['fields.creator.displayName'] == developer) &
-            (self.issues_data['fields.issuetype.name'].isin(['Sub-task', 'Bug']))
+            (self.issues_data['fields.issuetype.name'].isin(DEV_ISSUE_TYPES))
         ]
         bug_time = dev_issues[dev_issues['fields.issuetype.name'] == 'Bug']['fields.timespent'].sum() / 3600
         subtask_time = dev_issues[dev_issues['fields.issuetype.name'] == 'Sub-task']['fields.timespent'].sum() / 3600
@@ -52,27 +490,16 @@ class DeveloperRanking:
             (self.issues_data['fields.creator.displayName'] == developer) & 
             (self.issues_data['fields.issuetype.name'] == 'Bug')
         ]
-        normal = dev_bugs[dev_bugs['fields.priority.name'].isin(['Lowest', 'Low', 'Medium'])].shape[0]
-        critical = dev_bugs[dev_bugs['fields.priority.name'] == 'High'].shape[0]
-        blocker = dev_bugs[dev_bugs['fields.priority.name'].isin(['Highest', 'Must Have'])].shape[0]
+        normal = dev_bugs[dev_bugs['fields.priority.name'].isin(NORMAL_PRIORITIES)].shape[0]
+        critical = dev_bugs[dev_bugs['fields.priority.name'].isin(CRITICAL_PRIORITIES)].shape[0]
+        blocker = dev_bugs[dev_bugs['fields.priority.name'].isin(BLOCKER_PRIORITIES)].shape[0]
         return normal, critical, blocker
 
     def calculate_avg_completion_time(self, developer):
         dev_issues = self.issues_data[
             (self.issues_data['fields.creator.displayName'] == developer) &
-            (self.issues_data['fields.issuetype.name'].isin(['Sub-task', 'Bug']))
+            (self.issues_data['fields.issuetype.name'].isin(DEV_ISSUE_TYPES))
         ].copy()
-        
-        def parse_date(date_str):
-            try:
-                dt = pd.to_datetime(date_str, format='mixed')
-                if dt.tzinfo is None:
-                    dt = dt.replace(tzinfo=pytz.UTC)
-                else:
-                    dt = dt.astimezone(pytz.UTC)
-                return dt.replace(tzinfo=None)
-            except:
-                return pd.NaT
 
         dev_issues['created_date'] = dev_issues['fields.created'].apply(parse_date)
         dev_issues['resolution_date'] = dev_issues['fields.resolutiondate'].apply(parse_date)
@@ -87,7 +514,7 @@ class DeveloperRanking:
     def calculate_days_logged_8_hours(self, developer):
         dev_issues = self.issues_data[
             (self.issues_data['fields.creator.displayName'] == developer) &
-            (self.issues_data['fields.issuetype.name'].isin(['Sub-task', 'Bug']))
+            (self.issues_data['fields.issuetype.name'].isin(DEV_ISSUE_TYPES))
         ]
         total_time_spent = dev_issues['fields.timespent'].sum() / 3600
         days_logged_8_hours = total_time_spent / 8
@@ -96,7 +523,7 @@ class DeveloperRanking:
     def calculate_estimation_accuracy(self, developer):
         dev_issues = self.issues_data[
             (self.issues_data['fields.creator.displayName'] == developer) &
-            (self.issues_data['fields.issuetype.name'].isin(['Sub-task', 'Bug']))
+            (self.issues_data['fields.issuetype.name'].isin(DEV_ISSUE_TYPES))
         ].copy()
         dev_issues['estimation_accuracy'] = (dev_issues['fields.timespent'] / dev_issues['fields.timeoriginalestimate']) * 100
         dev_issues = dev_issues[dev_issues['estimation_accuracy'].notna() & (dev_issues['estimation_accuracy'] != np.inf)]
@@ -105,10 +532,9 @@ class DeveloperRanking:
     def calculate_project_vs_bench_time(self, developer):
         project_time = self.issues_data[
             (self.issues_data['fields.creator.displayName'] == developer) &
-            (self.issues_data['fields.issuetype.name'].isin(['Sub-task', 'Bug']))
+            (self.issues_data['fields.issuetype.name'].isin(DEV_ISSUE_TYPES))
         ]['fields.timespent'].sum() / 3600
-        total_work_hours = 6 * 22 * 8
-        bench_time = max(0, total_work_hours - project_time)
+        bench_time = max(0, TOTAL_WORK_HOURS - project_time)
         return round(project_time, 2), round(bench_time, 2)
 
     def calculate_score(self, row):
@@ -127,19 +553,25 @@ class DeveloperRanking:
             logging.error(f"Error message: {str(e)}")
             return 0  # Return a default score if calculation fails
 
-    def rank_developers(self):
+    def calculate_metrics_per_developer(self):
         rankings_list = []
         for developer in self.developers:
-            bug_time, subtask_time = self.calculate_time_spent(developer)
-            normal_bugs, critical_bugs, blocker_bugs = self.count_bugs_by_criticality(developer)
-            avg_completion_time = self.calculate_avg_completion_time(developer)
-            days_logged_8_hours = self.calculate_days_logged_8_hours(developer)
-            estimation_accuracy = self.calculate_estimation_accuracy(developer)
-            project_time, bench_time = self.calculate_project_vs_bench_time(developer)
+            with self.metrics.stage('calculate_time_spent'):
+                bug_time, subtask_time = self.calculate_time_spent(developer)
+            with self.metrics.stage('count_bugs_by_criticality'):
+                normal_bugs, critical_bugs, blocker_bugs = self.count_bugs_by_criticality(developer)
+            with self.metrics.stage('calculate_avg_completion_time'):
+                avg_completion_time = self.calculate_avg_completion_time(developer)
+            with self.metrics.stage('calculate_days_logged_8_hours'):
+                days_logged_8_hours = self.calculate_days_logged_8_hours(developer)
+            with self.metrics.stage('calculate_estimation_accuracy'):
+                estimation_accuracy = self.calculate_estimation_accuracy(developer)
+            with self.metrics.stage('calculate_project_vs_bench_time'):
+                project_time, bench_time = self.calculate_project_vs_bench_time(developer)
 
             rankings_list.append({
                 'Name': developer,
-                'Email': f"{developer.lower().replace(' ', '.')}@kiwitech.com",
+                'Email': developer_email(developer),
                 'BugTime': bug_time,
                 'SubtaskTime': subtask_time,
                 'BugCount': normal_bugs,
@@ -151,25 +583,74 @@ class DeveloperRanking:
                 'ProjectTime': project_time,
                 'BenchTime': bench_time
             })
+        return rankings_list
+
+    def calculate_scores(self, rankings, weights=None):
+        return score_rankings(rankings, self.score_model, weights)
+
+    def rank_developers(self, vectorized=True, state=None):
+        # The vectorized engine computes every metric in one groupby pass and scores all rows with
+        # calculate_scores; the per-developer calculate_* methods and the row-wise calculate_score
+        # are kept as the reference implementation. With a MetricState the metrics come from its
+        # accumulated totals instead of the loaded issues.
+        if state is not None:
+            self.rankings = self.calculate_all_metrics(state)
+        elif vectorized or self.issues_data is None or self.worklogs is not None:
+            self.rankings = self.calculate_all_metrics()
+        else:
+            self.rankings = pd.DataFrame(self.calculate_metrics_per_developer())
 
-        self.rankings = pd.DataFrame(rankings_list)
-        
         if self.rankings.empty:
             logging.warning("No developers met the criteria for ranking.")
             self.rankings = pd.DataFrame(columns=['Name', 'Email', 'TotalScore', 'Rank'])
         else:
-            self.rankings['TotalScore'] = self.rankings.apply(self.calculate_score, axis=1)
-            self.rankings = self.rankings.sort_values('TotalScore', ascending=False)
-            self.rankings['Rank'] = range(1, len(self.rankings) + 1)
+            with self.metrics.stage('calculate_scores'):
+                if vectorized:
+                    self.rankings['TotalScore'] = self.calculate_scores(self.rankings)
+                else:
+                    self.rankings['TotalScore'] = self.rankings.apply(self.calculate_score, axis=1)
+            with self.metrics.stage('sort_and_rank'):
+                self.rankings = self.rankings.sort_values('TotalScore', ascending=False)
+                self.rankings['Rank'] = range(1, len(self.rankings) + 1)
+        self.metrics.add('ranked_developers', len(self.rankings))
 
-        logging.info("Rankings DataFrame:")
-        logging.info(self.rankings.head())
         logging.info(f"Shape of rankings DataFrame: {self.rankings.shape}")
-        logging.info("Columns in the rankings DataFrame:")
-        logging.info(self.rankings.columns.tolist())
+        logging.debug("Rankings DataFrame:")
+        logging.debug(self.rankings.head())
+        logging.debug("Columns in the rankings DataFrame:")
+        logging.debug(self.rankings.columns.tolist())
+
+    def rank_windows(self, windows, date_column='fields.created'):
+        # One ranking per [start, end) window, with issues assigned to windows by date_column and bench time
+        # derived from each window's working hours instead of TOTAL_WORK_HOURS. All windows are computed together
+        # by windowed_partials and scored in a single calculate_scores call.
+        if self.issues_data is None:
+            raise ValueError("Windowed rankings need the loaded issues and cannot be combined with --workers")
+        with self.metrics.stage('windowed_partials'):
+            contributions = issue_contributions(self.issues_data, worklogs=self.worklogs)
+            times = parse_dates(self.issues_data.loc[contributions.index, date_column])
+            partials = windowed_partials(contributions, times, windows)
+
+        with self.metrics.stage('windowed_finalize_metrics'):
+            work_hours = window_work_hours(partials['WindowStart'], partials['WindowEnd'])
+            rankings = finalize_metrics(partials[METRIC_REGISTRY.partial_columns], work_hours).reset_index()
+            rankings.insert(0, 'WindowStart', partials['WindowStart'].to_numpy())
+            rankings.insert(1, 'WindowEnd', partials['WindowEnd'].to_numpy())
+            rankings.insert(3, 'Email', rankings['Name'].map(developer_email))
+        with self.metrics.stage('windowed_scores'):
+            rankings['TotalScore'] = self.calculate_scores(rankings)
+            rankings = rankings.sort_values(['WindowStart', 'WindowEnd', 'TotalScore'], ascending=[True, True, False],
+                                            kind='stable', ignore_index=True)
+            rankings['Rank'] = rankings.groupby(['WindowStart', 'WindowEnd']).cumcount() + 1
+        self.metrics.add('windows', len(windows))
+        logging.info(f"Ranked {len(rankings)} developer-windows across {len(windows)} windows")
+        return rankings
 
-    def save_rankings(self, output_file):
+    def save_rankings(self, output_file, database=None):
         desired_columns = ['Name', 'Email', 'BugTime', 'SubtaskTime', 'AvgCompletionTime', 'DaysLogged8Hours', 'ProjectTime', 'BenchTime', 'TotalScore', 'Rank']
+        # Metrics registered by plugins are saved too, before the score
+        plugin_columns = [col for col in METRIC_REGISTRY.metric_columns if col not in BUILTIN_METRIC_COLUMNS]
+        desired_columns[-2:-2] = plugin_columns
         available_columns = self.rankings.columns.tolist()
         
         logging.info("Desired columns:")
@@ -196,25 +677,148 @@ class DeveloperRanking:
         rankings_to_save.to_csv(output_file, index=False)
         logging.info(f"Rankings saved to {output_file}")
 
+        metadata = {
+            'generated_at': datetime.now(pytz.UTC).isoformat(),
+            'rows': len(rankings_to_save),
+            'columns': rankings_to_save.columns.tolist(),
+        }
+        with open(rankings_metadata_path(output_file), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        if database is not None:
+            # The history keeps every metric column, not just the ones the CSV shows
+            database.save_rankings(self.rankings, metadata['generated_at'], self.score_model.weights)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Rank developers from the extracted JIRA issues")
+    parser.add_argument('--compact', action='store_true',
+                        help="Load issues into a dictionary-encoded, compact-dtype table")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Aggregate the project files in this many processes instead of loading them all here")
+    parser.add_argument('--load-workers', type=int, default=None,
+                        help="Processes parsing the issue files (default: one per CPU)")
+    parser.add_argument('--cache-dir', default='.issue_cache',
+                        help="Cache of parsed issue files, reused while a file is unchanged (pass an empty string to skip it)")
+    parser.add_argument('--state-dir', default=None,
+                        help="Keep per-developer metric state here and only apply issues changed since the last run")
+    parser.add_argument('--verify-state', action='store_true',
+                        help="Check the metric state against a full recompute over the loaded issues")
+    parser.add_argument('--score-config', default=None, metavar='JSON_FILE',
+                        help='Score terms and weights, e.g. {"weights": {"DaysLogged": 50}, "terms": {"Speed": '
+                             '"ProjectTime / (AvgCompletionTime + 1)"}}; terms named here are added or replaced')
+    parser.add_argument('--metric-plugins', nargs='+', default=[], metavar='MODULE',
+                        help="Modules that register extra metrics on metric_registry.METRIC_REGISTRY when imported")
+    parser.add_argument('--attribute-time', choices=['creator', 'worklog'], default='creator',
+                        help="Credit issues and logged time to the issue creator, or to the authors of its worklogs "
+                             "(needs the worklogs table from jira_extract_final.py --worklogs)")
+    parser.add_argument('--database-url', default=None, metavar='URL',
+                        help="Also record this run's rankings in this database, e.g. sqlite:///jira_data.db or a "
+                             "postgresql:// URL (needs SQLAlchemy)")
+    parser.add_argument('--issues-from-database', action='store_true',
+                        help="Load the issues from --database-url (stored by jira_extract_final.py --database-url) "
+                             "instead of the issue files")
+    parser.add_argument('--output', default='developer_rankings_final.csv',
+                        help="Rankings CSV to write (default: developer_rankings_final.csv, the file the workflow commits)")
+    parser.add_argument('--cube-output', default='developer_metrics_cube.parquet',
+                        help="Parquet file for the developer x project x issue type x priority x week cube "
+                             "(pass an empty string to skip it)")
+    parser.add_argument('--windows', nargs='+', type=parse_window, default=None, metavar='START:END',
+                        help="Also rank each [START, END) window, e.g. 2024-04-01:2024-07-01")
+    parser.add_argument('--rolling', default=None, metavar='LENGTH',
+                        help="Also rank rolling windows of this length over the history, e.g. 30D")
+    parser.add_argument('--step', default=None, help="Distance between rolling windows (default: the window length)")
+    parser.add_argument('--start', default=None, help="Earliest rolling window start (default: the first issue)")
+    parser.add_argument('--end', default=None, help="Latest rolling window end (default: the day after the last issue)")
+    parser.add_argument('--window-date', choices=['created', 'updated', 'resolutiondate'], default='created',
+                        help="Issue date that decides which windows an issue falls into")
+    parser.add_argument('--windows-output', default='developer_rankings_windows.csv')
+    run_metrics.add_arguments(parser, 'ranking')
+    return parser.parse_args()
+
+def parse_window(value):
+    # START:END for plain dates, START/END when the bounds carry times
+    start, end = value.split('/', 1) if '/' in value else value.split(':', 1)
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if end <= start:
+        raise argparse.ArgumentTypeError(f"window {value} must end after it starts")
+    return start, end
+
 def main():
+    args = parse_args()
     try:
-        data_dir = 'jira_data_daily'
+        with run_metrics.instrumented_run('ranking', args.metrics_file, args.profile, args.trace_memory) as metrics:
+            run_ranking(args, metrics)
+    except Exception as e:
+        logging.error(f"An error occurred: {str(e)}")
+        raise
+
+def run_ranking(args, metrics):
+    data_dir = 'jira_data_daily'
+    if args.issues_from_database and not args.database_url:
+        raise ValueError("--issues-from-database needs --database-url")
+    if args.issues_from_database and args.workers:
+        raise ValueError("--workers aggregates the issue files and cannot be combined with --issues-from-database")
+    if not args.issues_from_database:
         if not os.path.exists(data_dir):
             raise FileNotFoundError(f"Directory not found: {data_dir}")
-        
-        files = [f for f in os.listdir(data_dir) if f.endswith('_issues.csv')]
+
+        files = issue_store.list_issue_files(data_dir)
         if not files:
-            raise FileNotFoundError(f"No CSV files found in {data_dir}")
-        
-        logging.info(f"Found {len(files)} CSV files in {data_dir}")
-        
-        ranking = DeveloperRanking(data_dir)
+            raise FileNotFoundError(f"No issue files found in {data_dir}")
+
+        logging.info(f"Found {len(files)} issue files in {data_dir}")
+        metrics.add('issue_files', len(files))
+
+    if args.state_dir and args.workers:
+        raise ValueError("--state-dir needs the loaded issues and cannot be combined with --workers")
+    if args.state_dir and args.attribute_time == 'worklog':
+        raise ValueError("--state-dir keeps creator-attributed state and cannot be combined with --attribute-time worklog")
+    if (args.windows or args.rolling) and args.workers:
+        raise ValueError("Windowed rankings need the loaded issues and cannot be combined with --workers")
+    load_plugins(METRIC_REGISTRY, args.metric_plugins)
+    score_model = SCORE_MODEL.load(args.score_config) if args.score_config else SCORE_MODEL
+    score_model.check_columns(METRIC_REGISTRY.metric_columns)
+    database = None
+    if args.database_url:
+        from issue_db import IssueDatabase
+
+        database = IssueDatabase(args.database_url)
+    ranking = DeveloperRanking(data_dir, compact=args.compact, workers=args.workers, metrics=metrics,
+                               load_workers=args.load_workers, cache_dir=args.cache_dir or None,
+                               attribute_time=args.attribute_time, score_model=score_model,
+                               database=database if args.issues_from_database else None)
+    if args.state_dir:
+        from metric_state import MetricState
+
+        with metrics.stage('metric_state'):
+            state = MetricState.load(args.state_dir)
+            metrics.add('changed_issues', state.apply(ranking.issues_data))
+            if args.verify_state and not state.verify(ranking.issues_data):
+                raise ValueError("Metric state does not match a full recompute")
+            state.save(args.state_dir)
+        ranking.rank_developers(state=state)
+    else:
         ranking.rank_developers()
-        ranking.save_rankings('`develop`er_rankings_final.csv')
-        
-    except Exception as e:
-        logging.error(f"An error occurred: {str(e)}")
-        raise
+    with metrics.stage('save_rankings'):
+        ranking.save_rankings(args.output, database)
+    if args.cube_output and ranking.cube is not None:
+        with metrics.stage('save_cube'):
+            save_cube(ranking.cube, args.cube_output)
+
+    if args.windows or args.rolling:
+        date_column = f'fields.{args.window_date}'
+        windows = list(args.windows or [])
+        if args.rolling:
+            dates = parse_dates(ranking.issues_data[date_column])
+            start = pd.Timestamp(args.start) if args.start else dates.min().floor('D')
+            end = pd.Timestamp(args.end) if args.end else dates.max().floor('D') + pd.Timedelta(days=1)
+            windows += rolling_windows(start, end, args.rolling, args.step or args.rolling)
+        window_rankings = ranking.rank_windows(windows, date_column)
+        columns = ['WindowStart', 'WindowEnd', 'Name', 'Email', 'BugTime', 'SubtaskTime', 'AvgCompletionTime',
+                   'DaysLogged8Hours', 'ProjectTime', 'BenchTime']
+        columns += [col for col in METRIC_REGISTRY.metric_columns if col not in BUILTIN_METRIC_COLUMNS]
+        columns += ['TotalScore', 'Rank']
+        window_rankings[columns].to_csv(args.windows_output, index=False)
+        logging.info(f"Windowed rankings saved to {args.windows_output}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
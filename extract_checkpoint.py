@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+# On-disk progress of a snapshot extraction. Every page of issues is written as soon as it arrives, as
+# pages/<PROJECT>/<startAt>-<count>.json, and checkpoint.json records which projects are complete. A run that crashes,
+# times out or fails on some projects is resumed from there, so the rerun only requests the pages that are missing.
+# Projects a partial run already published are marked so, and the rerun carries their files over.
+
+CHECKPOINT_FILE = 'checkpoint.json'
+PAGES_DIR = 'pages'
+
+class ExtractionCheckpoint:
+    def __init__(self, directory, state):
+        self.directory = directory
+        self.state = state
+        self.lock = threading.Lock()
+
+    @classmethod
+    def open(cls, directory, query, start_date, max_age=None, restart=False):
+        # Resumes the checkpoint in directory when it was taken for the same query (fields and expand) and is at
+        # most max_age seconds old. A resumed run keeps the original start date, so the JQL and its page offsets
+        # are the same as in the run that was interrupted.
+        path = os.path.join(directory, CHECKPOINT_FILE)
+        if os.path.exists(path) and not restart:
+            with open(path) as f:
+                state = json.load(f)
+            age = time.time() - state['started_at']
+            if state['query'] == query and (max_age is None or age <= max_age):
+                checkpoint = cls(directory, state)
+                logging.info(f"Resuming the extraction checkpoint in {directory} from {age / 60:.0f} minutes ago: "
+                             f"{len(checkpoint.completed_projects())} projects complete")
+                return checkpoint
+            logging.info(f"Discarding the extraction checkpoint in {directory}: it is older than the maximum age "
+                         f"or was taken for other fields")
+        if os.path.exists(directory):
+            shutil.rmtree(directory)
+        os.makedirs(os.path.join(directory, PAGES_DIR))
+        checkpoint = cls(directory, {'query': query, 'start_date': start_date, 'started_at': time.time(),
+                                     'projects': {}})
+        checkpoint.save()
+        return checkpoint
+
+    @property
+    def start_date(self):
+        return self.state['start_date']
+
+    def save(self):
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(f'{path}.tmp', path)
+
+    def project_dir(self, project_key):
+        return os.path.join(self.directory, PAGES_DIR, project_key)
+
+    def pages(self, project_key):
+        # (startAt, issue count, path) of every page held for a project, in startAt order
+        directory = self.project_dir(project_key)
+        if not os.path.exists(directory):
+            return []
+        pages = []
+        for filename in os.listdir(directory):
+            if filename.endswith('.json'):
+                start_at, count = filename[:-len('.json')].split('-')
+                pages.append((int(start_at), int(count), os.path.join(directory, filename)))
+        return sorted(pages)
+
+    def page_starts(self, project_key):
+        return {start_at for start_at, _, _ in self.pages(project_key)}
+
+    def resume_at(self, project_key):
+        # End of the pages held without a gap from startAt 0
+        position = 0
+        for start_at, count, _ in self.pages(project_key):
+            if start_at > position:
+                break
+            position = max(position, start_at + count)
+        return position
+
+    def save_page(self, project_key, start_at, issues):
+        # Written to a temporary name and renamed, so a page file always holds a whole page
+        directory = self.project_dir(project_key)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{start_at:09d}-{len(issues)}.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(issues, f)
+        os.replace(f'{path}.tmp', path)
+
+    def load_issues(self, project_key):
+        # Pages may overlap when issues moved between a run and its resume; the latest copy of an issue wins
+        issues = {}
+        for _, _, path in self.pages(project_key):
+            with open(path) as f:
+                for issue in json.load(f):
+                    issues[issue['id']] = issue
+        return list(issues.values())
+
+    def is_complete(self, project_key):
+        return self.state['projects'].get(project_key, {}).get('complete', False)
+
+    def completed_projects(self):
+        return [key for key, entry in self.state['projects'].items() if entry.get('complete')]
+
+    def is_published(self, project_key):
+        return self.state['projects'].get(project_key, {}).get('published', False)
+
+    def mark_published(self, project_keys):
+        with self.lock:
+            for project_key in project_keys:
+                self.state['projects'][project_key]['published'] = True
+            self.save()
+
+    def mark_complete(self, project_key):
+        with self.lock:
+            self.state['projects'][project_key] = {'complete': True}
+            self.save()
+
+    def mark_failed(self, project_key, error):
+        with self.lock:
+            # Where to resume is derived from the pages on disk, see resume_at
+            self.state['projects'][project_key] = {'complete': False, 'error': error}
+            self.save()
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,326 @@
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# A local stand-in for the JIRA REST endpoints the extractor uses (project list, myself, search),
+# so extraction can be exercised and timed without credentials or a real JIRA rate limit.
+
+ISSUE_TYPES = ['Sub-task', 'Bug', 'Story', 'Task']
+PRIORITIES = ['Lowest', 'Low', 'Medium', 'High', 'Highest']
+STATUSES = ['To Do', 'In Progress', 'In Review', 'Done']
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.000+0000'
+INLINE_WORKLOG_LIMIT = 20
+WORKLOG_LIST_LIMIT = 1000
+
+def user(name):
+    return {'displayName': name, 'accountId': name.lower().replace(' ', '-')}
+
+def make_worklogs(issue_id, created, developers, creator, first_id, rng):
+    # Mostly the creator's own work, but often someone else's, and now and then more than JIRA returns inline
+    count = rng.choice([0, 0, 1, 2, 3, 5, 8, 25])
+    worklogs = []
+    for i in range(count):
+        author = creator if rng.random() < 0.5 else rng.choice(developers)
+        started = created + timedelta(hours=rng.randrange(0, 200))
+        worklogs.append({
+            'id': str(first_id + i),
+            'issueId': issue_id,
+            'author': user(author),
+            'started': started.strftime(TIME_FORMAT),
+            'updated': (started + timedelta(hours=1)).strftime(TIME_FORMAT),
+            'timeSpentSeconds': rng.choice([900, 1800, 3600, 7200, 14400]),
+        })
+    return worklogs
+
+def make_changelog(created, developers, rng):
+    histories = []
+    at = created
+    for i, (old, new) in enumerate(zip(STATUSES, STATUSES[1:rng.randrange(1, len(STATUSES) + 1)])):
+        at += timedelta(hours=rng.randrange(1, 48))
+        histories.append({
+            'id': str(i + 1),
+            'author': user(rng.choice(developers)),
+            'created': at.strftime(TIME_FORMAT),
+            'items': [{'field': 'status', 'fromString': old, 'toString': new}],
+        })
+    return histories
+
+def make_issue(project_key, number, developers, rng):
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=rng.randrange(0, 60 * 24 * 200))
+    resolved = created + timedelta(hours=rng.randrange(1, 400)) if rng.random() < 0.7 else None
+    updated = resolved or created + timedelta(hours=rng.randrange(0, 100))
+    creator = rng.choice(developers)
+    return {
+        'id': str(100000 + number),
+        'key': f'{project_key}-{number}',
+        'fields': {
+            'project': {'key': project_key, 'name': project_key},
+            'creator': user(creator),
+            'issuetype': {'name': rng.choice(ISSUE_TYPES)},
+            'priority': {'name': rng.choice(PRIORITIES)},
+            'created': created.strftime(TIME_FORMAT),
+            'updated': updated.strftime(TIME_FORMAT),
+            'resolutiondate': resolved.strftime(TIME_FORMAT) if resolved else None,
+            'timeoriginalestimate': rng.choice([None, 3600, 7200, 14400, 28800]),
+            'timespent': rng.choice([None, 1800, 3600, 7200, 10800, 28800]),
+        }
+    }
+
+def epoch_ms(text):
+    return int(datetime.strptime(text, TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+class FakeJiraServer:
+    def __init__(self, host='127.0.0.1', port=0, projects=5, issues_per_project=500, developers=50,
+                 rate_limit=None, latency=0.0, max_page_size=100, seed=0):
+        rng = random.Random(seed)
+        activity_rng = random.Random(seed + 1)
+        names = [f'Developer {i}' for i in range(developers)]
+        self.projects = {}
+        # Worklogs and changelogs live beside the issues and are only included when a search asks for them
+        self.worklogs = {}
+        self.changelogs = {}
+        self.deleted_worklogs = []
+        number = 0
+        worklog_id = 500000
+        for p in range(projects):
+            project_key = f'PRJ{p}'
+            issues = []
+            for _ in range(issues_per_project):
+                number += 1
+                issue = make_issue(project_key, number, names, rng)
+                created = datetime.strptime(issue['fields']['created'], TIME_FORMAT).replace(tzinfo=timezone.utc)
+                self.worklogs[issue['id']] = make_worklogs(issue['id'], created, names,
+                                                           issue['fields']['creator']['displayName'], worklog_id,
+                                                           activity_rng)
+                worklog_id += len(self.worklogs[issue['id']])
+                self.changelogs[issue['id']] = make_changelog(created, names, activity_rng)
+                issues.append(issue)
+            self.projects[project_key] = issues
+        self.rate_limit = rate_limit
+        # project key -> startAt from which searches of that project answer 500, to exercise failure handling
+        self.failures = {}
+        self.latency = latency
+        self.max_page_size = max_page_size
+        self.request_count = 0
+        # (project key, startAt) of every search, so tests can tell which pages a run requested
+        self.searches = []
+        self.throttled_count = 0
+        self.window = (0, 0)
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class())
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def throttled(self):
+        with self.lock:
+            self.request_count += 1
+            if not self.rate_limit:
+                return False
+            second = int(time.monotonic())
+            start, count = self.window
+            if second != start:
+                start, count = second, 0
+            count += 1
+            self.window = (start, count)
+            if count > self.rate_limit:
+                self.throttled_count += 1
+                return True
+            return False
+
+    def fail_project(self, project_key, start_at=0):
+        self.failures[project_key] = start_at
+
+    def search(self, query):
+        jql = query.get('jql', [''])[0]
+        match = re.search(r'project = "([^"]+)"', jql)
+        with self.lock:
+            self.searches.append((match.group(1) if match else None, int(query.get('startAt', ['0'])[0])))
+        if match and int(query.get('startAt', ['0'])[0]) >= self.failures.get(match.group(1), float('inf')):
+            return None
+        issues = self.projects.get(match.group(1), []) if match else []
+        since = re.search(r'updated >= "([^"]+)"', jql)
+        if since:
+            cutoff = datetime.strptime(since.group(1), '%Y-%m-%d %H:%M').strftime('%Y-%m-%dT%H:%M')
+            issues = [issue for issue in issues if issue['fields']['updated'] >= cutoff]
+        start_at = int(query.get('startAt', ['0'])[0])
+        max_results = min(int(query.get('maxResults', ['50'])[0]), self.max_page_size)
+        page = issues[start_at:start_at + max_results]
+        fields = query.get('fields', [''])[0].split(',')
+        expand = query.get('expand', [''])[0].split(',')
+        if 'worklog' in fields or 'changelog' in expand:
+            page = [self.with_activity(issue, 'worklog' in fields, 'changelog' in expand) for issue in page]
+        return {
+            'startAt': start_at,
+            'maxResults': max_results,
+            'total': len(issues),
+            'issues': page,
+        }
+
+    def with_activity(self, issue, worklog, changelog):
+        issue = {**issue, 'fields': dict(issue['fields'])}
+        if worklog:
+            # Like JIRA, at most 20 worklogs come inline; 'total' tells the client whether to fetch the rest
+            worklogs = self.worklogs[issue['id']]
+            issue['fields']['worklog'] = {'startAt': 0, 'maxResults': INLINE_WORKLOG_LIMIT, 'total': len(worklogs),
+                                          'worklogs': worklogs[:INLINE_WORKLOG_LIMIT]}
+        if changelog:
+            histories = self.changelogs[issue['id']]
+            issue['changelog'] = {'startAt': 0, 'maxResults': len(histories), 'total': len(histories),
+                                  'histories': histories}
+        return issue
+
+    def all_worklogs(self):
+        return [worklog for worklogs in self.worklogs.values() for worklog in worklogs]
+
+    def issue_worklogs(self, issue_id, query):
+        worklogs = self.worklogs.get(issue_id)
+        if worklogs is None:
+            return None
+        start_at = int(query.get('startAt', ['0'])[0])
+        max_results = int(query.get('maxResults', ['5000'])[0])
+        return {'startAt': start_at, 'maxResults': max_results, 'total': len(worklogs),
+                'worklogs': worklogs[start_at:start_at + max_results]}
+
+    def updated_worklogs(self, query, deleted=False):
+        # /worklog/updated and /worklog/deleted: ids changed at or after 'since' (epoch ms), oldest first
+        since = int(query.get('since', ['0'])[0])
+        if deleted:
+            changes = [(worklog_id, at) for worklog_id, at in self.deleted_worklogs if at >= since]
+        else:
+            changes = [(worklog['id'], epoch_ms(worklog['updated'])) for worklog in self.all_worklogs()]
+            changes = [(worklog_id, at) for worklog_id, at in changes if at >= since]
+        changes.sort(key=lambda change: change[1])
+        page = changes[:WORKLOG_LIST_LIMIT]
+        last_page = len(changes) <= WORKLOG_LIST_LIMIT
+        until = page[-1][1] if page else since
+        return {
+            'values': [{'worklogId': int(worklog_id), 'updatedTime': at} for worklog_id, at in page],
+            'since': since,
+            'until': until,
+            'lastPage': last_page,
+        }
+
+    def worklog_list(self, body):
+        ids = {str(worklog_id) for worklog_id in body.get('ids', [])}
+        if len(ids) > WORKLOG_LIST_LIMIT:
+            return None
+        return [worklog for worklog in self.all_worklogs() if worklog['id'] in ids]
+
+    def add_worklog(self, issue_id, author, seconds, at=None):
+        at = at or datetime.now(timezone.utc)
+        worklog_id = str(max(int(w['id']) for w in self.all_worklogs()) + 1 if self.all_worklogs() else 500000)
+        worklog = {'id': worklog_id, 'issueId': issue_id, 'author': user(author), 'started': at.strftime(TIME_FORMAT),
+                   'updated': at.strftime(TIME_FORMAT), 'timeSpentSeconds': seconds}
+        self.worklogs[issue_id].append(worklog)
+        return worklog
+
+    def delete_worklog(self, worklog_id, at=None):
+        at = at or datetime.now(timezone.utc)
+        for worklogs in self.worklogs.values():
+            worklogs[:] = [worklog for worklog in worklogs if worklog['id'] != worklog_id]
+        self.deleted_worklogs.append((worklog_id, int(at.timestamp() * 1000)))
+
+    def handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if server.throttled():
+                    self.send_json(429, {'errorMessages': ['Rate limit exceeded']}, {'Retry-After': '1'})
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+                url = urlparse(self.path)
+                if url.path == '/rest/api/2/project':
+                    self.send_json(200, [{'key': key, 'name': key} for key in server.projects])
+                elif url.path == '/rest/api/2/myself':
+                    self.send_json(200, {'displayName': 'Fake User', 'timeZone': 'UTC'})
+                elif url.path == '/rest/api/2/search':
+                    page = server.search(parse_qs(url.query))
+                    if page is None:
+                        self.send_json(500, {'errorMessages': ['Internal server error']})
+                    else:
+                        self.send_json(200, page)
+                elif url.path in ('/rest/api/2/worklog/updated', '/rest/api/2/worklog/deleted'):
+                    self.send_json(200, server.updated_worklogs(parse_qs(url.query), url.path.endswith('deleted')))
+                elif re.fullmatch(r'/rest/api/2/issue/[^/]+/worklog', url.path):
+                    worklogs = server.issue_worklogs(url.path.split('/')[-2], parse_qs(url.query))
+                    if worklogs is None:
+                        self.send_json(404, {'errorMessages': ['Issue does not exist']})
+                    else:
+                        self.send_json(200, worklogs)
+                else:
+                    self.send_json(404, {'errorMessages': [f'Unknown path {url.path}']})
+
+            def do_POST(self):
+                if server.throttled():
+                    self.send_json(429, {'errorMessages': ['Rate limit exceeded']}, {'Retry-After': '1'})
+                    return
+                url = urlparse(self.path)
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if url.path == '/rest/api/2/worklog/list':
+                    worklogs = server.worklog_list(body)
+                    if worklogs is None:
+                        self.send_json(400, {'errorMessages': [f'At most {WORKLOG_LIST_LIMIT} ids per request']})
+                    else:
+                        self.send_json(200, worklogs)
+                else:
+                    self.send_json(404, {'errorMessages': [f'Unknown path {url.path}']})
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic JIRA data over the REST endpoints the extractor uses")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--projects', type=int, default=5)
+    parser.add_argument('--issues-per-project', type=int, default=500)
+    parser.add_argument('--developers', type=int, default=50)
+    parser.add_argument('--rate-limit', type=int, default=None, help="Requests per second before answering 429")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds of delay added to every response")
+    args = parser.parse_args()
+
+    server = FakeJiraServer(port=args.port, projects=args.projects, issues_per_project=args.issues_per_project,
+                            developers=args.developers, rate_limit=args.rate_limit, latency=args.latency)
+    logging.info(f"Fake JIRA listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import logging
+import hashlib
+import csv
+import shutil
+
+CSV_SUFFIX = '_issues.csv'
+PARQUET_SUFFIX = '_issues.parquet'
+
+# The only columns the ranking reads; everything else in the normalized JIRA payload
+# (avatar URLs, self links, descriptions) is dropped from the columnar store.
+ISSUE_COLUMNS = [
+    'id', 'key', 'fields.project.key', 'fields.creator.displayName', 'fields.issuetype.name',
+    'fields.priority.name', 'fields.timespent', 'fields.timeoriginalestimate',
+    'fields.created', 'fields.updated', 'fields.resolutiondate'
+]
+STRING_COLUMNS = ['id', 'key']
+CATEGORY_COLUMNS = ['fields.project.key', 'fields.creator.displayName', 'fields.issuetype.name', 'fields.priority.name']
+INTEGER_COLUMNS = ['fields.timespent', 'fields.timeoriginalestimate']
+TIMESTAMP_COLUMNS = ['fields.created', 'fields.updated', 'fields.resolutiondate']
+# json_normalize leaves out nested fields that are empty on every issue of a project (e.g. no issue has a
+# priority), so these may be missing from a file; any other missing column means the file is unusable
+OPTIONAL_COLUMNS = ['key', 'fields.priority.name']
+REQUIRED_COLUMNS = [col for col in ISSUE_COLUMNS if col not in OPTIONAL_COLUMNS]
+SYNC_STATE_FILE = 'sync_state.json'
+# Work logged on issues and their field history, one table each for the whole data directory
+WORKLOG_TABLE = 'worklogs'
+WORKLOG_COLUMNS = ['id', 'issueId', 'author', 'authorAccountId', 'started', 'updated', 'timeSpentSeconds']
+CHANGELOG_TABLE = 'changelog'
+CHANGELOG_COLUMNS = ['issueId', 'historyId', 'created', 'author', 'field', 'fromString', 'toString']
+TABLE_KEYS = {WORKLOG_TABLE: ['id'], CHANGELOG_TABLE: ['issueId', 'historyId', 'field']}
+TABLE_ID_COLUMNS = ['id', 'issueId', 'historyId']
+WORKLOG_STATE_FILE = 'worklog_sync.json'
+# Bump whenever the parsed frames change shape, so older cache entries are ignored
+PARSED_CACHE_VERSION = 1
+
+class IssueSchemaError(ValueError):
+    pass
+
+def to_issue_table(df):
+    table = df.reindex(columns=ISSUE_COLUMNS)
+    for col in STRING_COLUMNS:
+        table[col] = table[col].astype('string')
+    for col in CATEGORY_COLUMNS:
+        table[col] = table[col].astype('category')
+    for col in INTEGER_COLUMNS:
+        table[col] = pd.to_numeric(table[col], errors='coerce').round().astype('Int64')
+    for col in TIMESTAMP_COLUMNS:
+        table[col] = pd.to_datetime(table[col], format='mixed', utc=True, errors='coerce')
+    return table
+
+def save_to_parquet(df, project_key, output_dir='jira_data_daily'):
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    file_path = os.path.join(output_dir, f'{project_key}{PARQUET_SUFFIX}')
+    to_issue_table(df).to_parquet(file_path, index=False)
+    logging.info(f"Data saved to {file_path}")
+
+def arrow_schema():
+    import pyarrow as pa
+
+    types = {col: pa.string() for col in STRING_COLUMNS}
+    types.update({col: pa.dictionary(pa.int32(), pa.string()) for col in CATEGORY_COLUMNS})
+    types.update({col: pa.int64() for col in INTEGER_COLUMNS})
+    types.update({col: pa.timestamp('us', tz='UTC') for col in TIMESTAMP_COLUMNS})
+    return pa.schema([(col, types[col]) for col in ISSUE_COLUMNS])
+
+class IssueFileWriter:
+    # Appends pages of issues to a project's file as they arrive, so a project is never held in memory whole.
+    # The file is only created (or an older copy truncated) once the first non-empty page is written.
+    def __init__(self, project_key, output_dir='jira_data_daily', storage_format='csv'):
+        self.paths = []
+        if storage_format in ('csv', 'both'):
+            self.paths.append(os.path.join(output_dir, f'{project_key}{CSV_SUFFIX}'))
+        if storage_format in ('parquet', 'both'):
+            self.paths.append(os.path.join(output_dir, f'{project_key}{PARQUET_SUFFIX}'))
+        self.output_dir = output_dir
+        self.parquet_writer = None
+        self.started = False
+        self.row_count = 0
+
+    def write(self, df):
+        if df.empty:
+            return
+        # Project threads may share a new output directory
+        os.makedirs(self.output_dir, exist_ok=True)
+        table = to_issue_table(df)
+        first_page = not self.started
+        self.started = True
+        for path in self.paths:
+            if path.endswith(CSV_SUFFIX):
+                table.to_csv(path, mode='w' if first_page else 'a', header=first_page, index=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                if self.parquet_writer is None:
+                    self.parquet_writer = pq.ParquetWriter(path, arrow_schema())
+                self.parquet_writer.write_table(pa.Table.from_pandas(table, schema=arrow_schema(), preserve_index=False))
+        self.row_count += len(table)
+
+    def close(self):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+        if self.row_count:
+            logging.info(f"Data saved to {', '.join(self.paths)} ({self.row_count} issues)")
+
+    def abort(self):
+        # Only removes files this writer has written to; a copy from an earlier run is left alone
+        self.close()
+        if not self.started:
+            return
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+def project_files(project_key, data_dir):
+    # Every stored copy (CSV and/or Parquet) of one project's issues
+    paths = [os.path.join(data_dir, f'{project_key}{suffix}') for suffix in (CSV_SUFFIX, PARQUET_SUFFIX)]
+    return [path for path in paths if os.path.exists(path)]
+
+def list_issue_files(data_dir):
+    # One file per project; a Parquet partition takes precedence over a CSV export of the same project
+    files = {}
+    for filename in os.listdir(data_dir):
+        if filename.endswith(PARQUET_SUFFIX):
+            files[filename[:-len(PARQUET_SUFFIX)]] = os.path.join(data_dir, filename)
+        elif filename.endswith(CSV_SUFFIX):
+            files.setdefault(filename[:-len(CSV_SUFFIX)], os.path.join(data_dir, filename))
+    return list(files.values())
+
+def file_columns(path):
+    if path.endswith(PARQUET_SUFFIX):
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(path).names
+    # Just the header line; read_csv(nrows=0) would still tokenize a whole buffer of the wide file
+    with open(path, newline='') as f:
+        return next(csv.reader(f), [])
+
+def read_issue_file(path):
+    # Reads only the ranking columns with fixed dtypes (strings as object, seconds as float64, timestamps left for
+    # the caller to parse), failing on a file that lacks a required column instead of filling it with NaN
+    columns = file_columns(path)
+    missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing:
+        raise IssueSchemaError(f"{path} is missing required columns: {', '.join(missing)}")
+    present = [col for col in ISSUE_COLUMNS if col in columns]
+    if path.endswith(PARQUET_SUFFIX):
+        table = pd.read_parquet(path, columns=present)
+    else:
+        table = pd.read_csv(path, usecols=present, dtype={col: object for col in present if col not in INTEGER_COLUMNS})
+        for col in INTEGER_COLUMNS:
+            table[col] = pd.to_numeric(table[col], errors='coerce').astype('float64')
+    return table.reindex(columns=ISSUE_COLUMNS)
+
+class ParsedFileCache:
+    # Parsed issue frames keyed by the source file's path, mtime and size, so an unchanged project file is not
+    # re-read and re-parsed on the next run. Each source keeps only its latest entry per variant.
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def entry_prefix(self, path, variant):
+        source = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+        return f'{source}-{variant}-'
+
+    def entry_path(self, path, variant):
+        stat = os.stat(path)
+        version = hashlib.sha1(f'{stat.st_mtime_ns}-{stat.st_size}-{PARSED_CACHE_VERSION}'.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f'{self.entry_prefix(path, variant)}{version}.pkl')
+
+    def get(self, path, variant):
+        entry = self.entry_path(path, variant)
+        if not os.path.exists(entry):
+            return None
+        try:
+            return pd.read_pickle(entry)
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable cache entry {entry}: {str(e)}")
+            return None
+
+    def put(self, path, variant, frame, entry=None):
+        # entry is the key taken before the file was read, so a file rewritten meanwhile is re-parsed next time
+        entry = entry or self.entry_path(path, variant)
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        frame.to_pickle(f'{entry}.{os.getpid()}.tmp')
+        os.replace(f'{entry}.{os.getpid()}.tmp', entry)
+        prefix = self.entry_prefix(path, variant)
+        for filename in os.listdir(self.cache_dir):
+            if filename.startswith(prefix) and filename.endswith('.pkl') and filename != os.path.basename(entry):
+                os.remove(os.path.join(self.cache_dir, filename))
+
+def to_compact_frame(table):
+    # Dictionary-encoded strings, 32-bit nullable seconds and naive UTC datetime64 (int64 underneath);
+    # the issue key is dropped since nothing in the ranking reads it
+    frame = table.reindex(columns=[col for col in ISSUE_COLUMNS if col != 'key'])
+    frame['id'] = pd.to_numeric(frame['id'], errors='coerce').astype('Int64')
+    for col in CATEGORY_COLUMNS:
+        frame[col] = frame[col].astype('category')
+    for col in INTEGER_COLUMNS:
+        frame[col] = pd.to_numeric(frame[col], errors='coerce').round().astype('Int32')
+    for col in TIMESTAMP_COLUMNS:
+        frame[col] = pd.to_datetime(frame[col], format='mixed', utc=True, errors='coerce').dt.tz_localize(None)
+    return frame
+
+def concat_compact_frames(frames):
+    # Give every frame the same categories first, otherwise concat falls back to object columns
+    for col in CATEGORY_COLUMNS:
+        categories = pd.Index(sorted(set().union(*(frame[col].cat.categories for frame in frames))))
+        for frame in frames:
+            frame[col] = frame[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+def memory_usage_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+def to_ranking_frame(table):
+    # Plain object/float64 columns, matching what the ranking gets from pd.read_csv
+    frame = table.copy()
+    for col in frame.columns:
+        if isinstance(frame[col].dtype, (pd.CategoricalDtype, pd.StringDtype)):
+            frame[col] = frame[col].astype(object).where(frame[col].notna(), np.nan)
+        elif col in INTEGER_COLUMNS:
+            frame[col] = pd.to_numeric(frame[col], errors='coerce').astype('float64')
+    return frame
+
+def merge_issues(existing, updates):
+    # Upsert by issue id: the most recently fetched version of an issue wins
+    merged = pd.concat([existing, updates], ignore_index=True)
+    issue_ids = merged['id'].astype(str)
+    return merged[~issue_ids.duplicated(keep='last')].reset_index(drop=True)
+
+def upsert_issues(df, project_key, data_dir, storage_format='csv'):
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    if storage_format in ('csv', 'both'):
+        file_path = os.path.join(data_dir, f'{project_key}{CSV_SUFFIX}')
+        merged = df
+        if os.path.exists(file_path):
+            merged = merge_issues(pd.read_csv(file_path), df)
+        merged.to_csv(file_path, index=False)
+        logging.info(f"Upserted {len(df)} issues into {file_path} ({len(merged)} total)")
+    if storage_format in ('parquet', 'both'):
+        file_path = os.path.join(data_dir, f'{project_key}{PARQUET_SUFFIX}')
+        merged = to_issue_table(df)
+        if os.path.exists(file_path):
+            merged = to_issue_table(merge_issues(pd.read_parquet(file_path), merged))
+        merged.to_parquet(file_path, index=False)
+        logging.info(f"Upserted {len(df)} issues into {file_path} ({len(merged)} total)")
+
+def table_path(name, data_dir, suffix):
+    return os.path.join(data_dir, f'{name}{suffix}')
+
+def read_table_file(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype={col: str for col in TABLE_ID_COLUMNS})
+
+def read_table(name, data_dir):
+    # The Parquet copy is preferred, like list_issue_files; None when the table was never extracted
+    for suffix in ('.parquet', '.csv'):
+        path = table_path(name, data_dir, suffix)
+        if os.path.exists(path):
+            return read_table_file(path)
+    return None
+
+def write_table(df, path):
+    if path.endswith('.parquet'):
+        df.to_parquet(f'{path}.tmp', index=False)
+    else:
+        df.to_csv(f'{path}.tmp', index=False)
+    os.replace(f'{path}.tmp', path)
+
+def upsert_table(df, name, data_dir, storage_format='csv'):
+    # Rows are replaced by key (a worklog id, or an issue's history item), the latest fetch winning
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    key = TABLE_KEYS[name]
+    df = df.astype({col: str for col in TABLE_ID_COLUMNS if col in df.columns})
+    suffixes = {'csv': ['.csv'], 'parquet': ['.parquet'], 'both': ['.csv', '.parquet']}[storage_format]
+    for suffix in suffixes:
+        path = table_path(name, data_dir, suffix)
+        merged = pd.concat([read_table_file(path), df], ignore_index=True) if os.path.exists(path) else df
+        # df itself may repeat a key too, e.g. the inline worklogs of an issue and its fully fetched list
+        merged = merged[~merged.duplicated(subset=key, keep='last')].reset_index(drop=True)
+        write_table(merged, path)
+        logging.info(f"Upserted {len(df)} rows into {path} ({len(merged)} total)")
+
+def delete_from_table(name, data_dir, column, values):
+    values = {str(value) for value in values}
+    for suffix in ('.csv', '.parquet'):
+        path = table_path(name, data_dir, suffix)
+        if os.path.exists(path):
+            table = read_table_file(path)
+            kept = table[~table[column].astype(str).isin(values)]
+            if len(kept) < len(table):
+                write_table(kept.reset_index(drop=True), path)
+                logging.info(f"Removed {len(table) - len(kept)} rows from {path}")
+
+def load_sync_state(data_dir, filename=SYNC_STATE_FILE):
+    state_path = os.path.join(data_dir, filename)
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path) as f:
+        return json.load(f)
+
+def save_sync_state(state, data_dir, filename=SYNC_STATE_FILE):
+    if not os.path.exists(data_dir):
+        os.makedirs(data_dir)
+    state_path = os.path.join(data_dir, filename)
+    temp_path = f'{state_path}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(temp_path, state_path)
+
+def replace_directory(new_dir, data_dir):
+    # Two renames, so data_dir is never a half-written directory. A crash between them leaves only
+    # <data_dir>.old, which restore_directory moves back on the next run.
+    old_dir = f'{data_dir}.old'
+    if os.path.exists(old_dir):
+        shutil.rmtree(old_dir)
+    if os.path.exists(data_dir):
+        os.rename(data_dir, old_dir)
+    os.rename(new_dir, data_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+def restore_directory(data_dir):
+    old_dir = f'{data_dir}.old'
+    if not os.path.exists(data_dir) and os.path.exists(old_dir):
+        os.rename(old_dir, data_dir)
+        logging.warning(f"Restored {data_dir} from {old_dir} after an interrupted publish")
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from email.utils import parsedate_to_datetime
+
+import aiohttp
+
+import run_metrics
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+class TokenBucket:
+    # Adapts like AIMD: a 429 halves the refill rate, each successful request wins back a little of it
+    def __init__(self, rate, capacity=None, min_rate=0.5):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        return now
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = self._refill()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        # A 429 applies to the whole client, so every pending request waits it out
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def record_success(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+def retry_after_seconds(value):
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class AsyncJiraDataExtractor:
+    def __init__(self, base_url, email, api_token, max_connections=10, rate=10, max_retries=5, backoff=1.0,
+                 metrics=None):
+        self.base_url = base_url
+        self.auth = aiohttp.BasicAuth(email, api_token)
+        self.headers = {"Accept": "application/json"}
+        self.max_connections = max_connections
+        self.limiter = TokenBucket(rate)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.metrics = metrics or run_metrics.RunMetrics('extract')
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        self.session = aiohttp.ClientSession(auth=self.auth, headers=self.headers, connector=connector)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def get_json(self, path, params=None, project=None):
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            with self.metrics.rate_limit_wait_time():
+                await self.limiter.acquire()
+            start = time.perf_counter()
+            async with self.session.get(url, params=params) as response:
+                body = await response.read()
+                self.metrics.record_request(time.perf_counter() - start, len(body), response.status, project)
+                if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                    delay = retry_after_seconds(response.headers.get('Retry-After'))
+                    if delay is None:
+                        delay = self.backoff * 2 ** attempt
+                    logging.warning(f"HTTP {response.status} from {path}, retrying in {delay:.1f}s")
+                    self.metrics.record_retry(response.status)
+                    self.limiter.pause(delay)
+                    continue
+                response.raise_for_status()
+                self.limiter.record_success()
+                return await response.json()
+
+    async def get_all_projects(self):
+        return await self.get_json("/rest/api/2/project")
+
+    async def get_user_timezone(self):
+        return (await self.get_json("/rest/api/2/myself")).get('timeZone')
+
+    async def get_issues(self, jql, fields, max_results=100, project=None, expand=None, start_at=0, skip=(),
+                         on_page=None):
+        # on_page(start_at, issues) sees every page as it arrives. Pages starting at an offset in skip (already held
+        # by a checkpoint) are not requested and are missing from the result.
+        def params(page_start):
+            page_params = {
+                "jql": jql,
+                "fields": ",".join(fields),
+                "startAt": page_start,
+                "maxResults": max_results
+            }
+            if expand:
+                page_params["expand"] = expand
+            return page_params
+
+        async def fetch(page_start):
+            page = await self.get_json("/rest/api/2/search", params(page_start), project)
+            if on_page is not None:
+                on_page(page_start, page['issues'])
+            return page
+
+        first_page = await fetch(start_at)
+        issues = list(first_page['issues'])
+        # JIRA may cap maxResults below what was asked for, so page by what it actually returned
+        page_size = first_page.get('maxResults') or max_results
+        if not issues or start_at + len(issues) >= first_page['total']:
+            return issues
+
+        pages = await asyncio.gather(*[
+            fetch(page_start)
+            for page_start in range(start_at + page_size, first_page['total'], page_size)
+            if page_start not in skip
+        ])
+        for page in pages:
+            issues.extend(page['issues'])
+        return issues
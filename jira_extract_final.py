@@ -7,34 +7,60 @@ import shutil
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import logging
+import argparse
+import asyncio
+import issue_store
+import run_metrics
+from extract_checkpoint import ExtractionCheckpoint
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+SYNC_OVERLAP = timedelta(minutes=1)
+ISSUE_FIELDS = ["key", "project", "creator", "issuetype", "priority", "created", "updated", "resolutiondate", "timeoriginalestimate", "timespent"]
+WORKLOG_BATCH_SIZE = 1000  # ids per /worklog/list request, JIRA's maximum
+REQUEST_TIMEOUT = 60  # seconds; a hung request fails its project instead of stalling the run
+
 class JiraDataExtractor:
-    def __init__(self, base_url, email, api_token):
+    def __init__(self, base_url, email, api_token, metrics=None, timeout=REQUEST_TIMEOUT):
         self.base_url = base_url
         self.auth = HTTPBasicAuth(email, api_token)
         self.headers = {"Accept": "application/json"}
         self.session = requests.Session()
         self.session.auth = self.auth
         self.session.headers.update(self.headers)
+        self.timeout = timeout
+        self.metrics = metrics or run_metrics.RunMetrics('extract')
+
+    def get(self, url, params=None, project=None):
+        start = time.perf_counter()
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        self.metrics.record_request(time.perf_counter() - start, len(response.content), response.status_code, project)
+        response.raise_for_status()
+        return response
+
+    def post(self, url, payload, project=None):
+        start = time.perf_counter()
+        response = self.session.post(url, json=payload, timeout=self.timeout)
+        self.metrics.record_request(time.perf_counter() - start, len(response.content), response.status_code, project)
+        response.raise_for_status()
+        return response
 
     def get_all_projects(self):
         url = f"{self.base_url}/rest/api/2/project"
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json()
+        return self.get(url).json()
 
     def get_project_details(self, project_key):
         url = f"{self.base_url}/rest/api/2/project/{project_key}"
-        response = self.session.get(url)
-        response.raise_for_status()
-        return response.json()
+        return self.get(url).json()
+
+    def get_user_timezone(self):
+        # JQL date literals are interpreted in the timezone of the querying user
+        url = f"{self.base_url}/rest/api/2/myself"
+        return self.get(url).json().get('timeZone')
 
-    def get_issues(self, jql, fields, start_at=0, max_results=100):
+    def iter_pages(self, jql, fields, start_at=0, max_results=100, project=None, expand=None):
         url = f"{self.base_url}/rest/api/2/search"
-        issues = []
 
         while True:
             params = {
@@ -43,19 +69,55 @@ class JiraDataExtractor:
                 "startAt": start_at,
                 "maxResults": max_results
             }
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            issues.extend(data['issues'])
-            
-            if len(issues) >= data['total']:
+            if expand:
+                params["expand"] = expand
+            data = self.get(url, params, project).json()
+
+            yield data['issues']
+            # JIRA may return fewer issues than maxResults, so page by what it actually returned
+            start_at += len(data['issues'])
+
+            if not data['issues'] or start_at >= data['total']:
                 break
-            
-            start_at += max_results
-            time.sleep(1)  # Respect rate limits
 
-        return issues
+            with self.metrics.rate_limit_wait_time():
+                time.sleep(1)  # Respect rate limits
+
+    def iter_issues(self, jql, fields, start_at=0, max_results=100, project=None, expand=None):
+        for page in self.iter_pages(jql, fields, start_at, max_results, project, expand):
+            yield from page
+
+    def get_issues(self, jql, fields, start_at=0, max_results=100, project=None, expand=None):
+        return list(self.iter_issues(jql, fields, start_at, max_results, project, expand))
+
+    def get_issue_worklogs(self, issue_id, project=None):
+        url = f"{self.base_url}/rest/api/2/issue/{issue_id}/worklog"
+        worklogs = []
+        while True:
+            data = self.get(url, {"startAt": len(worklogs), "maxResults": 5000}, project).json()
+            worklogs.extend(data['worklogs'])
+            if not data['worklogs'] or len(worklogs) >= data['total']:
+                return worklogs
+
+    def get_changed_worklog_ids(self, since, deleted=False):
+        # Ids of worklogs updated (or deleted) since an epoch-ms time, across all projects. Pages are time ranges:
+        # each page's 'until' is where the next one starts, and the last one is where the next sync starts.
+        url = f"{self.base_url}/rest/api/2/worklog/{'deleted' if deleted else 'updated'}"
+        worklog_ids = []
+        while True:
+            data = self.get(url, {"since": since}).json()
+            worklog_ids.extend(str(value['worklogId']) for value in data['values'])
+            since = data.get('until', since)
+            if data.get('lastPage', True):
+                return worklog_ids, since
+
+    def get_worklogs(self, worklog_ids):
+        url = f"{self.base_url}/rest/api/2/worklog/list"
+        worklogs = []
+        for start in range(0, len(worklog_ids), WORKLOG_BATCH_SIZE):
+            batch = [int(worklog_id) for worklog_id in worklog_ids[start:start + WORKLOG_BATCH_SIZE]]
+            worklogs.extend(self.post(url, {"ids": batch}).json())
+        return worklogs
 
 def clean_and_transform_data(df):
     date_columns = ['fields.created', 'fields.updated', 'fields.resolutiondate']
@@ -71,72 +133,456 @@ def save_to_csv(df, filename, output_dir='jira_data_daily'):
     df.to_csv(file_path, index=False)
     logging.info(f"Data saved to {file_path}")
 
-def process_project(jira, project, start_date):
+def issue_request(args):
+    # With --worklogs the inline worklogs and the changelog come with the same search requests as the issues
+    if args.worklogs:
+        return ISSUE_FIELDS + ["worklog"], "changelog"
+    return ISSUE_FIELDS, None
+
+def worklog_rows(worklogs):
+    return pd.DataFrame([{
+        'id': str(worklog['id']),
+        'issueId': str(worklog['issueId']),
+        'author': (worklog.get('author') or {}).get('displayName'),
+        'authorAccountId': (worklog.get('author') or {}).get('accountId'),
+        'started': worklog.get('started'),
+        'updated': worklog.get('updated'),
+        'timeSpentSeconds': worklog.get('timeSpentSeconds'),
+    } for worklog in worklogs], columns=issue_store.WORKLOG_COLUMNS)
+
+def split_activity(issues):
+    # Takes the inline worklogs and changelog out of the raw issues, so json_normalize produces the usual columns.
+    # Also returns the ids of issues with more worklogs than JIRA returns inline.
+    worklogs, changelog, truncated = [], [], []
+    for issue in issues:
+        worklog = issue['fields'].pop('worklog', None) or {}
+        inline = worklog.get('worklogs', [])
+        for entry in inline:
+            entry.setdefault('issueId', issue['id'])
+        worklogs.extend(inline)
+        if worklog.get('total', 0) > len(inline):
+            truncated.append(issue['id'])
+        for history in (issue.pop('changelog', None) or {}).get('histories', []):
+            for item in history.get('items', []):
+                changelog.append({
+                    'issueId': str(issue['id']),
+                    'historyId': str(history['id']),
+                    'created': history.get('created'),
+                    'author': (history.get('author') or {}).get('displayName'),
+                    'field': item.get('field'),
+                    'fromString': item.get('fromString'),
+                    'toString': item.get('toString'),
+                })
+    return worklogs, pd.DataFrame(changelog, columns=issue_store.CHANGELOG_COLUMNS), truncated
+
+def fetch_truncated_worklogs(jira, project_key, issue_ids, max_requests):
+    worklogs = []
+    for count, issue_id in enumerate(issue_ids):
+        if count >= max_requests:
+            logging.warning(f"{project_key}: reached the cap of {max_requests} worklog requests, "
+                            f"{len(issue_ids) - count} issues keep only their inline worklogs")
+            break
+        worklogs.extend(jira.get_issue_worklogs(issue_id, project=project_key))
+    return worklogs
+
+def save_activity(jira, project_data, data_dir, args):
+    project_key = project_data['project_key']
+    worklogs, changelog, truncated = split_activity(project_data['issues'])
+    worklogs.extend(fetch_truncated_worklogs(jira, project_key, truncated, args.max_worklog_requests))
+    worklogs = worklog_rows(worklogs)
+    jira.metrics.add_project(project_key, worklogs=len(worklogs))
+    if not worklogs.empty:
+        issue_store.upsert_table(worklogs, issue_store.WORKLOG_TABLE, data_dir, args.format)
+    if not changelog.empty:
+        issue_store.upsert_table(changelog, issue_store.CHANGELOG_TABLE, data_dir, args.format)
+
+def sync_worklogs(jira, data_dir, args, run_started):
+    # Worklogs changed on any issue since the last sync, fetched by id in batches, plus deletions. The first sync
+    # only records where to start: its baseline is the worklogs that came with the issues.
+    state = issue_store.load_sync_state(data_dir, issue_store.WORKLOG_STATE_FILE)
+    since = state.get('since')
+    if since is None:
+        state['since'] = run_started
+    else:
+        updated_ids, until = jira.get_changed_worklog_ids(since)
+        if updated_ids:
+            worklogs = worklog_rows(jira.get_worklogs(updated_ids))
+            issue_store.upsert_table(worklogs, issue_store.WORKLOG_TABLE, data_dir, args.format)
+        deleted_ids, _ = jira.get_changed_worklog_ids(since, deleted=True)
+        if deleted_ids:
+            issue_store.delete_from_table(issue_store.WORKLOG_TABLE, data_dir, 'id', deleted_ids)
+        logging.info(f"Synced {len(updated_ids)} updated and {len(deleted_ids)} deleted worklogs")
+        state['since'] = until
+    issue_store.save_sync_state(state, data_dir, issue_store.WORKLOG_STATE_FILE)
+
+def project_jql(project_key, start_date):
+    jql = f'project = "{project_key}"'
+    if start_date:
+        jql += f' AND updated >= "{start_date}"'
+    # A fixed order keeps page offsets meaningful across a resumed run: issues only join the result set, which at
+    # worst shifts a page onto issues already fetched
+    return jql + ' ORDER BY created ASC, key ASC'
+
+def process_project(jira, project, start_date, fields=ISSUE_FIELDS, expand=None, checkpoint=None):
+    # With a checkpoint every page is persisted as it arrives, fetching resumes after the pages already held, and
+    # the project's issues are read back from the checkpoint once it is complete
+    project_key = project['key']
+    if checkpoint is not None and checkpoint.is_complete(project_key):
+        logging.info(f"Project {project_key} is complete in the checkpoint")
+        return {'project_key': project_key, 'issues': checkpoint.load_issues(project_key)}
+    start_at = checkpoint.resume_at(project_key) if checkpoint is not None else 0
+    logging.info(f"Processing project: {project_key}" + (f" from startAt {start_at}" if start_at else ""))
+
+    try:
+        issues = []
+        for page in jira.iter_pages(project_jql(project_key, start_date), fields, start_at=start_at,
+                                    project=project_key, expand=expand):
+            if checkpoint is not None:
+                checkpoint.save_page(project_key, start_at, page)
+            else:
+                issues.extend(page)
+            start_at += len(page)
+        if checkpoint is not None:
+            checkpoint.mark_complete(project_key)
+            issues = checkpoint.load_issues(project_key)
+
+        return {
+            'project_key': project_key,
+            'issues': issues
+        }
+    except Exception as e:
+        logging.error(f"Error processing project {project_key}: {str(e)}")
+        if checkpoint is not None:
+            checkpoint.mark_failed(project_key, str(e))
+        return None
+
+def process_project_streaming(jira, project, start_date, output_dir, storage_format):
     project_key = project['key']
     logging.info(f"Processing project: {project_key}")
 
+    writer = issue_store.IssueFileWriter(project_key, output_dir, storage_format)
     try:
-        jql = f'project = "{project_key}" AND updated >= "{start_date}"'
-        fields = ["key", "project", "creator", "issuetype", "priority", "created", "updated", "resolutiondate", "timeoriginalestimate", "timespent"]
-        issues = jira.get_issues(jql, fields)
+        for page in jira.iter_pages(project_jql(project_key, start_date), ISSUE_FIELDS, project=project_key):
+            writer.write(pd.json_normalize(page))
+        writer.close()
+        jira.metrics.add_project(project_key, issues=writer.row_count)
+        jira.metrics.add('issues', writer.row_count)
+        return {
+            'project_key': project_key,
+            'issue_count': writer.row_count
+        }
+    except Exception as e:
+        logging.error(f"Error processing project {project_key}: {str(e)}")
+        writer.abort()
+        return None
 
+def extract_streaming(jira, projects, start_date, output_dir, args):
+    # Returns the keys of the projects that failed; their partial files are removed
+    failed = []
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        future_to_project = {
+            executor.submit(process_project_streaming, jira, project, start_date, output_dir, args.format): project
+            for project in projects
+        }
+        for future in as_completed(future_to_project):
+            project_data = future.result()
+            if project_data is None:
+                failed.append(future_to_project[future]['key'])
+            elif not project_data['issue_count']:
+                logging.info(f"No issues found for project: {project_data['project_key']}")
+    return sorted(failed)
+
+async def process_project_async(jira, project, start_date, fields=ISSUE_FIELDS, expand=None, checkpoint=None):
+    project_key = project['key']
+    if checkpoint is not None and checkpoint.is_complete(project_key):
+        logging.info(f"Project {project_key} is complete in the checkpoint")
+        return {'project_key': project_key, 'issues': checkpoint.load_issues(project_key)}
+    start_at = checkpoint.resume_at(project_key) if checkpoint is not None else 0
+    logging.info(f"Processing project: {project_key}" + (f" from startAt {start_at}" if start_at else ""))
+
+    try:
+        if checkpoint is not None:
+            await jira.get_issues(project_jql(project_key, start_date), fields, project=project_key, expand=expand,
+                                  start_at=start_at, skip=checkpoint.page_starts(project_key),
+                                  on_page=lambda page_start, page: checkpoint.save_page(project_key, page_start, page))
+            checkpoint.mark_complete(project_key)
+            issues = checkpoint.load_issues(project_key)
+        else:
+            issues = await jira.get_issues(project_jql(project_key, start_date), fields, project=project_key,
+                                           expand=expand)
         return {
             'project_key': project_key,
             'issues': issues
         }
     except Exception as e:
         logging.error(f"Error processing project {project_key}: {str(e)}")
+        if checkpoint is not None:
+            checkpoint.mark_failed(project_key, str(e))
+        return None
+
+async def fetch_projects_async(jira, projects, start_dates, args, checkpoint=None):
+    from jira_async_client import AsyncJiraDataExtractor
+
+    async_jira = AsyncJiraDataExtractor(jira.base_url, jira.auth.username, jira.auth.password,
+                                        max_connections=args.max_connections, rate=args.rate_limit,
+                                        metrics=jira.metrics)
+    fields, expand = issue_request(args)
+    async with async_jira:
+        return await asyncio.gather(*[
+            process_project_async(async_jira, project, start_dates.get(project['key']), fields, expand, checkpoint)
+            for project in projects
+        ])
+
+def fetch_projects(jira, projects, start_dates, args, checkpoint=None):
+    for project_data in fetch_project_issues(jira, projects, start_dates, args, checkpoint):
+        jira.metrics.add_project(project_data['project_key'], issues=len(project_data['issues']))
+        jira.metrics.add('issues', len(project_data['issues']))
+        yield project_data
+
+def fetch_project_issues(jira, projects, start_dates, args, checkpoint=None):
+    if args.use_async:
+        for project_data in asyncio.run(fetch_projects_async(jira, projects, start_dates, args, checkpoint)):
+            if project_data:
+                yield project_data
+        return
+
+    fields, expand = issue_request(args)
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        future_to_project = {
+            executor.submit(process_project, jira, project, start_dates.get(project['key']), fields, expand,
+                            checkpoint): project
+            for project in projects
+        }
+        for future in as_completed(future_to_project):
+            project_data = future.result()
+            if project_data:
+                yield project_data
+
+def sync_start_date(last_synced, user_timezone):
+    # JQL only has minute resolution, so step back a little and let the upsert drop the overlap.
+    # Without the user's timezone, widen the overlap to a full day to cover any UTC offset.
+    if last_synced is None:
         return None
+    since = pd.Timestamp(last_synced)
+    if user_timezone:
+        since = since.tz_convert(user_timezone) - SYNC_OVERLAP
+    else:
+        since = since - timedelta(days=1)
+    return since.strftime('%Y-%m-%d %H:%M')
+
+def latest_update(issues_df, last_synced):
+    # With no parseable updated time the previous mark is kept; without one either, the next run fetches everything
+    updated = pd.to_datetime(issues_df['fields.updated'], format='mixed', utc=True, errors='coerce').max()
+    if pd.isna(updated) or (last_synced is not None and pd.Timestamp(last_synced) > updated):
+        return last_synced
+    return updated.isoformat()
+
+def publish(staging_dir, data_dir, kept_projects, args):
+    # Projects not fetched in this run (failed, or already published from the checkpoint being resumed) keep their
+    # previous files, and with --worklogs the worklog and changelog rows of those issues
+    kept_ids = []
+    for project_key in kept_projects:
+        paths = issue_store.project_files(project_key, data_dir) if os.path.exists(data_dir) else []
+        for path in paths:
+            shutil.copy2(path, staging_dir)
+        if args.worklogs and paths:
+            kept_ids.extend(issue_store.read_issue_file(paths[0])['id'].astype(str))
+    if args.worklogs and kept_ids:
+        for name in (issue_store.WORKLOG_TABLE, issue_store.CHANGELOG_TABLE):
+            previous = issue_store.read_table(name, data_dir)
+            if previous is not None:
+                rows = previous[previous['issueId'].astype(str).isin(kept_ids)]
+                if not rows.empty:
+                    issue_store.upsert_table(rows, name, staging_dir, args.format)
+    issue_store.replace_directory(staging_dir, data_dir)
+
+def open_database(args):
+    # Imported here so SQLAlchemy is only needed when a database is used
+    if not args.database_url:
+        return None
+    from issue_db import IssueDatabase
+
+    return IssueDatabase(args.database_url)
+
+def extract_incremental(jira, projects, args, database=None):
+    data_dir = 'jira_data_daily'
+    sync_state = issue_store.load_sync_state(data_dir)
+    try:
+        user_timezone = jira.get_user_timezone()
+    except requests.RequestException as e:
+        logging.warning(f"Could not read the JIRA user timezone, widening the sync overlap: {str(e)}")
+        user_timezone = None
+
+    save_to_csv(pd.DataFrame(projects), 'all_projects.csv', output_dir=data_dir)
+
+    start_dates = {}
+    for project in projects:
+        start_dates[project['key']] = sync_start_date(sync_state.get(project['key']), user_timezone)
+        logging.info(f"Syncing {project['key']} from: {start_dates[project['key']] or 'the beginning'}")
+
+    run_started = int(time.time() * 1000)
+    for project_data in fetch_projects(jira, projects, start_dates, args):
+        project_key = project_data['project_key']
+
+        if args.worklogs:
+            with jira.metrics.stage('worklogs'):
+                save_activity(jira, project_data, data_dir, args)
+        with jira.metrics.stage('normalize'):
+            issues_df = pd.json_normalize(project_data['issues'])
+        if not issues_df.empty:
+            with jira.metrics.stage('normalize'):
+                issues_df = clean_and_transform_data(issues_df)
+            with jira.metrics.stage('upsert_issues'):
+                issue_store.upsert_issues(issues_df, project_key, data_dir, args.format)
+                if database is not None:
+                    database.upsert_issues(issues_df)
+                sync_state[project_key] = latest_update(issues_df, sync_state.get(project_key))
+                issue_store.save_sync_state(sync_state, data_dir)
+        else:
+            logging.info(f"No updated issues for project: {project_key}")
+
+    if args.worklogs:
+        with jira.metrics.stage('sync_worklogs'):
+            sync_worklogs(jira, data_dir, args, run_started)
+    logging.info("Incremental data extraction completed.")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract JIRA issues for the developer ranking")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='csv',
+                        help="Storage format for the per-project issue files (default: csv)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Fetch only issues updated since the last sync and upsert them into jira_data_daily")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="Fetch all projects and their pages concurrently with the asyncio client (needs aiohttp)")
+    parser.add_argument('--max-connections', type=int, default=10,
+                        help="Connection pool size for the asyncio client (default: 10)")
+    parser.add_argument('--rate-limit', type=float, default=10,
+                        help="Requests per second allowed by the asyncio client's token bucket (default: 10)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Write each page of issues to the project file as it arrives instead of buffering projects")
+    parser.add_argument('--worklogs', action='store_true',
+                        help="Also extract worklogs and changelogs into their own tables (worklogs, changelog)")
+    parser.add_argument('--max-worklog-requests', type=int, default=100,
+                        help="Per project, how many issues with more than 20 worklogs get their full list fetched")
+    parser.add_argument('--database-url', default=None, metavar='URL',
+                        help="Also store the issues in this database, e.g. sqlite:///jira_data.db or a postgresql:// "
+                             "URL (needs SQLAlchemy)")
+    parser.add_argument('--checkpoint-dir', default='jira_data_temp',
+                        help="Where fetched pages are kept until the data is published, so a failed run can resume")
+    parser.add_argument('--checkpoint-max-age', type=float, default=24,
+                        help="Hours after which an unfinished checkpoint is discarded instead of resumed (default: 24)")
+    parser.add_argument('--restart', action='store_true', help="Discard any checkpoint and fetch everything again")
+    run_metrics.add_arguments(parser, 'extract')
+    args = parser.parse_args()
+    if args.stream and (args.incremental or args.use_async or args.worklogs or args.database_url):
+        parser.error("--stream cannot be combined with --incremental, --async, --worklogs or --database-url")
+    return args
 
 def main():
+    args = parse_args()
+    with run_metrics.instrumented_run('extract', args.metrics_file, args.profile, args.trace_memory) as metrics:
+        extract(args, metrics)
+
+def extract(args, metrics):
     logging.info("Starting JIRA data extraction")
     load_dotenv()
 
     jira = JiraDataExtractor(
         base_url=os.getenv('JIRA_BASE_URL'),
         email=os.getenv('JIRA_EMAIL'),
-        api_token=os.getenv('JIRA_API_TOKEN')
+        api_token=os.getenv('JIRA_API_TOKEN'),
+        metrics=metrics
     )
 
     logging.info(f"JIRA Base URL: {os.getenv('JIRA_BASE_URL')}")
     logging.info(f"JIRA Email: {os.getenv('JIRA_EMAIL')}")
+    database = open_database(args)
+
+    if args.incremental:
+        with metrics.stage('get_all_projects'):
+            projects = jira.get_all_projects()
+        logging.info(f"Found {len(projects)} projects")
+        with metrics.stage('extract_incremental'):
+            extract_incremental(jira, projects, args, database)
+        return
+
+    data_dir = 'jira_data_daily'
+    issue_store.restore_directory(data_dir)
 
     # Calculate start date (5 days ago)
     start_date = (datetime.now() - timedelta(days=5)).strftime('%Y-%m-%d %H:%M')
-    logging.info(f"Fetching data from: {start_date}")
 
-    # Create a temporary directory for new data
-    temp_dir = 'jira_data_temp'
-    if os.path.exists(temp_dir):
-        shutil.rmtree(temp_dir)
-    os.makedirs(temp_dir)
-    logging.info(f"Created temporary directory: {temp_dir}")
+    # New data is written to a staging directory next to the data directory and swapped in at the end
+    staging_dir = f'{data_dir}.new'
+    if os.path.exists(staging_dir):
+        shutil.rmtree(staging_dir)
+    os.makedirs(staging_dir)
+    logging.info(f"Created staging directory: {staging_dir}")
 
-    projects = jira.get_all_projects()
+    with metrics.stage('get_all_projects'):
+        projects = jira.get_all_projects()
     logging.info(f"Found {len(projects)} projects")
+    metrics.add('projects', len(projects))
     projects_df = pd.DataFrame(projects)
-    save_to_csv(projects_df, 'all_projects.csv', output_dir=temp_dir)
+    save_to_csv(projects_df, 'all_projects.csv', output_dir=staging_dir)
 
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_project = {executor.submit(process_project, jira, project, start_date): project for project in projects}
-        for future in as_completed(future_to_project):
-            project_data = future.result()
-            if project_data:
+    checkpoint = None
+    if args.stream:
+        logging.info(f"Fetching data from: {start_date}")
+        with metrics.stage('extract_streaming'):
+            failed = extract_streaming(jira, projects, start_date, staging_dir, args)
+    else:
+        fields, expand = issue_request(args)
+        checkpoint = ExtractionCheckpoint.open(args.checkpoint_dir, {'fields': fields, 'expand': expand}, start_date,
+                                               args.checkpoint_max_age * 3600, args.restart)
+        logging.info(f"Fetching data from: {checkpoint.start_date}")
+        start_dates = {project['key']: checkpoint.start_date for project in projects}
+        # Projects an earlier run of this checkpoint already published are carried over instead of rebuilt
+        published = [project['key'] for project in projects if checkpoint.is_published(project['key'])]
+        pending = [project for project in projects if project['key'] not in published]
+        # Fetching overlaps with the normalize and save stages below, so 'fetch_and_save' is the wall time of both
+        with metrics.stage('fetch_and_save'):
+            for project_data in fetch_projects(jira, pending, start_dates, args, checkpoint):
                 project_key = project_data['project_key']
-                
-                issues_df = pd.json_normalize(project_data['issues'])
+
+                if args.worklogs:
+                    with metrics.stage('worklogs'):
+                        save_activity(jira, project_data, staging_dir, args)
+                with metrics.stage('normalize'):
+                    issues_df = pd.json_normalize(project_data['issues'])
+                    if not issues_df.empty:
+                        issues_df = clean_and_transform_data(issues_df)
                 if not issues_df.empty:
-                    issues_df = clean_and_transform_data(issues_df)
-                    save_to_csv(issues_df, f'{project_key}_issues.csv', output_dir=temp_dir)
+                    with metrics.stage('save'):
+                        if args.format in ('csv', 'both'):
+                            save_to_csv(issues_df, f'{project_key}_issues.csv', output_dir=staging_dir)
+                        if args.format in ('parquet', 'both'):
+                            issue_store.save_to_parquet(issues_df, project_key, output_dir=staging_dir)
                 else:
                     logging.info(f"No issues found for project: {project_key}")
+                if database is not None:
+                    # Like the project's file, its rows are replaced as a whole (and removed when it has no issues)
+                    with metrics.stage('save_database'):
+                        database.replace_project_issues(issues_df, project_key)
+        failed = [project['key'] for project in pending if not checkpoint.is_complete(project['key'])]
 
     # Replace old data with new data
-    old_dir = 'jira_data_daily'
-    if os.path.exists(old_dir):
-        shutil.rmtree(old_dir)
-    os.rename(temp_dir, old_dir)
-    logging.info(f"Replaced old data directory with new data")
+    for project_key in failed:
+        logging.warning(f"Fetching {project_key} failed, keeping its previous data")
+    with metrics.stage('publish'):
+        publish(staging_dir, data_dir, failed + (published if checkpoint is not None else []), args)
+    logging.info(f"Published the new data to {data_dir}")
+
+    if failed:
+        if checkpoint is not None:
+            checkpoint.mark_published([project['key'] for project in pending if project['key'] not in failed])
+        metrics.add('failed_projects', len(failed))
+        message = f"{len(failed)} projects failed and kept their previous data: {', '.join(failed)}"
+        if checkpoint is not None:
+            message += f". Rerun to fetch only their missing pages from {args.checkpoint_dir}"
+        logging.warning(message)
+    elif checkpoint is not None:
+        checkpoint.remove()
 
     logging.info("Daily data extraction completed. Old data replaced with new data.")
     logging.info(f"Contents of jira_data_daily: {os.listdir('jira_data_daily')}")
@@ -0,0 +1,194 @@
+import ast
+import importlib
+import json
+
+import numpy as np
+import pandas as pd
+
+# Declarative metrics for the vectorized ranking engine, in three layers:
+#   values   - per-issue series derived from the issue columns (e.g. parsed completion hours), computed at most once
+#              per pass and shared by every partial that reads them
+#   partials - per-issue contributions that are summed per developer (or per cube cell, window, project)
+#   metrics  - functions of the summed partials and of earlier metrics; hidden metrics are shared intermediates
+# Score terms are formulas over the metrics, each with a weight, and can be changed from a JSON config without code.
+
+FORMULA_FUNCTIONS = {'min': np.minimum, 'max': np.maximum, 'abs': np.abs, 'sqrt': np.sqrt, 'log': np.log}
+FORMULA_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Name, ast.Constant, ast.Call, ast.Load, ast.Add, ast.Sub,
+                 ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd)
+
+class Value:
+    def __init__(self, name, columns, compute):
+        self.name = name
+        self.columns = columns
+        self.compute = compute
+
+class Partial:
+    def __init__(self, name, inputs, compute):
+        self.name = name
+        self.inputs = inputs
+        self.compute = compute
+
+class Metric:
+    def __init__(self, name, inputs, compute, hidden=False):
+        self.name = name
+        self.inputs = inputs
+        self.compute = compute
+        self.hidden = hidden
+
+class IssueValues:
+    # Lazily computed per-issue values over one issue frame; each value is computed the first time it is read
+    def __init__(self, registry, issues):
+        self.registry = registry
+        self.issues = issues
+        self.cache = {}
+
+    def __getitem__(self, name):
+        if name not in self.cache:
+            value = self.registry.values.get(name)
+            if value is None:
+                self.cache[name] = self.issues[name]
+            else:
+                self.cache[name] = value.compute(self)
+        return self.cache[name]
+
+class MetricRegistry:
+    def __init__(self):
+        self.values = {}
+        self.partials = {}
+        self.metrics = {}
+        self.plugins = []
+
+    def add_value(self, name, columns, compute):
+        # compute(values) reads issue columns and other values by name, e.g. values['fields.timespent']
+        self.values[name] = Value(name, columns, compute)
+
+    def add_partial(self, name, inputs, compute):
+        # compute(values) returns the per-issue contribution (a series or a constant) summed into the partial
+        self.check_inputs(name, inputs, set(self.values), issue_columns=True)
+        self.partials[name] = Partial(name, inputs, compute)
+
+    def add_metric(self, name, inputs, compute, hidden=False):
+        # compute(inputs, total_work_hours) gets the named partials and earlier metrics; total_work_hours is a number,
+        # or a series aligned with the partials for windowed rankings
+        self.check_inputs(name, inputs, set(self.partials) | set(self.metrics))
+        self.metrics[name] = Metric(name, inputs, compute, hidden)
+
+    def check_inputs(self, name, inputs, known, issue_columns=False):
+        unknown = [item for item in inputs if item not in known and not (issue_columns and item.startswith('fields.'))]
+        if unknown:
+            raise ValueError(f"{name} depends on unregistered inputs: {unknown}")
+
+    @property
+    def partial_columns(self):
+        return list(self.partials)
+
+    @property
+    def metric_columns(self):
+        return [name for name, metric in self.metrics.items() if not metric.hidden]
+
+    def issue_columns(self):
+        # Issue table columns the registered values and partials read
+        columns = {col for value in self.values.values() for col in value.columns}
+        columns |= {col for partial in self.partials.values() for col in partial.inputs if col.startswith('fields.')}
+        return sorted(columns)
+
+    def issue_values(self, issues):
+        missing = [col for col in self.issue_columns() if col not in issues.columns]
+        if missing:
+            raise ValueError(f"Registered metrics need issue columns that are not loaded: {missing}")
+        return IssueValues(self, issues)
+
+    def contributions(self, values):
+        # Every registered partial for each issue of an IssueValues, in one pass over its issue frame
+        return pd.DataFrame({name: partial.compute(values) for name, partial in self.partials.items()},
+                            index=values.issues.index)
+
+    def finalize(self, partials, total_work_hours):
+        computed = {col: partials[col] for col in self.partial_columns}
+        for name, metric in self.metrics.items():
+            computed[name] = metric.compute({item: computed[item] for item in metric.inputs}, total_work_hours)
+        metrics = pd.DataFrame(index=partials.index)
+        for name in self.metric_columns:
+            metrics[name] = computed[name]
+        return metrics
+
+class Formula:
+    # An arithmetic expression over metric names, with min, max, abs, sqrt and log applied element-wise
+    def __init__(self, expression):
+        tree = ast.parse(expression, mode='eval')
+        for node in ast.walk(tree):
+            if not isinstance(node, FORMULA_NODES):
+                raise ValueError(f"Unsupported syntax in score formula {expression!r}: {type(node).__name__}")
+            if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.keywords
+                                               or node.func.id not in FORMULA_FUNCTIONS):
+                raise ValueError(f"Only {', '.join(FORMULA_FUNCTIONS)} can be called in score formula {expression!r}")
+        self.expression = expression
+        names = [node.id for node in ast.walk(tree) if isinstance(node, ast.Name)]
+        self.names = list(dict.fromkeys(name for name in names if name not in FORMULA_FUNCTIONS))
+        self.code = compile(tree, '<score formula>', 'eval')
+
+    def evaluate(self, values):
+        return eval(self.code, {'__builtins__': {}, **FORMULA_FUNCTIONS}, values)
+
+class ScoreModel:
+    # The total score is the sum of weight * term over the terms, in order
+    def __init__(self, terms, weights):
+        missing = [name for name in terms if name not in weights]
+        if missing:
+            raise ValueError(f"Score terms without a weight: {missing}")
+        self.terms = {name: Formula(expression) for name, expression in terms.items()}
+        self.weights = {name: weights[name] for name in terms}
+
+    @property
+    def columns(self):
+        return list(dict.fromkeys(name for formula in self.terms.values() for name in formula.names))
+
+    def check_columns(self, metric_columns):
+        # Run once the plugins are loaded, so a misspelled metric fails before any issue is read
+        for name, formula in self.terms.items():
+            unknown = [col for col in formula.names if col not in metric_columns]
+            if unknown:
+                raise ValueError(f"Score term {name} ({formula.expression!r}) uses unknown metrics: {unknown}")
+
+    def with_config(self, config):
+        # config: {"terms": {name: formula}, "weights": {name: weight}}; a term is added or replaced by name, and a
+        # weight of 0 switches a term off
+        terms = {name: formula.expression for name, formula in self.terms.items()}
+        terms.update(config.get('terms', {}))
+        weights = {**self.weights, **config.get('weights', {})}
+        unknown = set(config.get('weights', {})) - set(terms)
+        if unknown:
+            raise ValueError(f"Weights for unknown score terms: {sorted(unknown)}")
+        return ScoreModel(terms, weights)
+
+    def load(self, path):
+        with open(path) as f:
+            return self.with_config(json.load(f))
+
+    def evaluate(self, values, weights=None):
+        # Returns the unrounded scores and the rows where a term divided by zero (a non-finite term from finite
+        # inputs)
+        weights = self.weights if weights is None else {**self.weights, **weights}
+        score = None
+        division_errors = np.zeros(len(next(iter(values.values()))), dtype=bool)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for name, formula in self.terms.items():
+                term = np.asarray(formula.evaluate(values), dtype='float64')
+                finite_inputs = np.logical_and.reduce([np.isfinite(values[col]) for col in formula.names]) \
+                    if formula.names else True
+                division_errors |= ~np.isfinite(term) & finite_inputs
+                term = term * weights[name]
+                score = term if score is None else score + term
+        return score, division_errors
+
+# The registry the ranking engine reads. dev_ranking_daily registers the built-in metrics on it, and plugins import it
+# from here rather than from dev_ranking_daily, which may be running as __main__.
+METRIC_REGISTRY = MetricRegistry()
+
+def load_plugins(registry, modules):
+    # Plugin modules register their values, partials and metrics on import. The names are kept so worker processes
+    # can import the same plugins.
+    for module in modules or []:
+        importlib.import_module(module)
+        if module not in registry.plugins:
+            registry.plugins.append(module)
@@ -0,0 +1,108 @@
+import pandas as pd
+import numpy as np
+import os
+import logging
+from dev_ranking_daily import (METRIC_REGISTRY, issue_contributions, aggregate_partials, eligible_developers,
+                               finalize_metrics)
+
+def count_columns():
+    return [col for col in METRIC_REGISTRY.partial_columns if col.endswith('Count')]
+
+def contribution_columns():
+    return ['Developer', 'Updated'] + METRIC_REGISTRY.partial_columns
+
+class MetricState:
+    # Persisted per-developer accumulators plus the contribution of every issue seen (zero for other issue types than
+    # Sub-task/Bug), so a run only has to retract the old contribution of each changed or deleted issue and add the
+    # new one of each changed issue instead of rescanning the history.
+    def __init__(self, contributions=None, totals=None):
+        if contributions is None:
+            contributions = pd.DataFrame(columns=contribution_columns(), index=pd.Index([], name='id', dtype=object))
+        if totals is None:
+            totals = pd.DataFrame(columns=METRIC_REGISTRY.partial_columns,
+                                  index=pd.Index([], name='Developer', dtype=object), dtype='float64')
+        self.contributions = contributions
+        self.totals = totals
+
+    @classmethod
+    def load(cls, state_dir):
+        contributions_path = os.path.join(state_dir, 'contributions.parquet')
+        totals_path = os.path.join(state_dir, 'totals.parquet')
+        if not os.path.exists(contributions_path) or not os.path.exists(totals_path):
+            logging.info(f"No metric state found in {state_dir}, starting from scratch")
+            return cls()
+        contributions, totals = pd.read_parquet(contributions_path), pd.read_parquet(totals_path)
+        if list(totals.columns) != METRIC_REGISTRY.partial_columns:
+            # Saved with other registered metrics (e.g. a plugin added or removed), so the sums cannot be reused
+            logging.info(f"Metric state in {state_dir} was saved for other metrics, starting from scratch")
+            return cls()
+        return cls(contributions, totals)
+
+    def save(self, state_dir):
+        if not os.path.exists(state_dir):
+            os.makedirs(state_dir)
+        for name, df in [('contributions', self.contributions), ('totals', self.totals)]:
+            path = os.path.join(state_dir, f'{name}.parquet')
+            df.to_parquet(f'{path}.tmp')
+            os.replace(f'{path}.tmp', path)
+        logging.info(f"Metric state saved to {state_dir}")
+
+    def changed_issues(self, issues):
+        issues = issues.drop_duplicates(subset='id', keep='last')
+        issue_ids = issues['id'].astype(str)
+        known_updated = self.contributions['Updated'].reindex(issue_ids.values)
+        unchanged = known_updated.notna().values & (known_updated.values == issues['fields.updated'].values)
+        return issues[~unchanged]
+
+    def apply(self, issues):
+        # issues is the whole snapshot, so an issue known to the state but missing from it was deleted in JIRA
+        changed = self.changed_issues(issues)
+        changed_ids = changed['id'].astype(str)
+        deleted_ids = self.contributions.index.difference(issues['id'].astype(str))
+        removed_ids = changed_ids.tolist() + deleted_ids.tolist()
+
+        retracted = self.contributions[self.contributions.index.isin(removed_ids)]
+        # Issues that contribute nothing (other issue types) are still recorded so they are not re-applied next run
+        added = issue_contributions(changed).reindex(changed.index)
+        partial_columns = METRIC_REGISTRY.partial_columns
+        added[partial_columns] = added[partial_columns].fillna(0)
+        added[count_columns()] = added[count_columns()].astype('int64')
+        added['Developer'] = added['Developer'].astype(object)
+        added.insert(1, 'Updated', changed['fields.updated'])
+        added.index = pd.Index(changed_ids.values, name='id')
+
+        totals = self.totals.sub(retracted.groupby('Developer')[partial_columns].sum(), fill_value=0)
+        totals = totals.add(added.groupby('Developer', observed=True)[partial_columns].sum(), fill_value=0)
+        # The sums keep object dtype when either side started out empty, which finalize_metrics cannot round
+        totals = totals.astype('float64')
+        totals[count_columns()] = totals[count_columns()].astype('int64')
+        self.totals = totals[totals['IssueCount'] > 0].sort_index()
+
+        kept = self.contributions[~self.contributions.index.isin(removed_ids)]
+        added = added[contribution_columns()]
+        self.contributions = pd.concat([kept, added]) if len(kept) else added
+        logging.info(f"Applied {len(changed)} changed and {len(deleted_ids)} deleted issues "
+                     f"({len(retracted)} retracted, {len(added)} added)")
+        return len(changed) + len(deleted_ids)
+
+    def metrics(self):
+        return finalize_metrics(self.totals.loc[eligible_developers(self.totals)])
+
+    def verify(self, issues):
+        # A full recompute over the same issue history must give the same rankings inputs
+        partials = aggregate_partials(issues)
+        expected = finalize_metrics(partials.loc[eligible_developers(partials)])
+        actual = self.metrics()
+        mismatched = []
+        if list(expected.index) != list(actual.index):
+            mismatched.append('developers')
+        else:
+            for col in METRIC_REGISTRY.metric_columns:
+                if not np.allclose(expected[col].to_numpy(dtype='float64'), actual[col].to_numpy(dtype='float64'),
+                                   rtol=0, atol=1e-9):
+                    mismatched.append(col)
+        if mismatched:
+            logging.error(f"Metric state does not match a full recompute: {mismatched}")
+        else:
+            logging.info("Metric state matches a full recompute")
+        return not mismatched
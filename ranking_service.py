@@ -0,0 +1,311 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+import numpy as np
+import pandas as pd
+
+import issue_store
+from dev_ranking_daily import (DeveloperRanking, METRIC_REGISTRY, SCORE_MODEL, aggregate_project_partials,
+                               eligible_developers, finalize_metrics, developer_email, score_rankings)
+from metric_registry import load_plugins
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# A local HTTP/JSON service answering ranking queries from per-(developer, project) partials kept in memory.
+# Filtering by project only sums partial rows, so a query never touches the issues; the partials are rebuilt
+# when the files in the data directory change.
+
+def ranking_columns():
+    # Read at query time, so metrics registered by plugins are included
+    return ['Name', 'Email'] + METRIC_REGISTRY.metric_columns + ['TotalScore', 'Rank']
+
+class QueryError(ValueError):
+    pass
+
+def data_version(data_dir):
+    # Changes whenever an issue file is added, removed or rewritten, including the directory swap of a snapshot run
+    files = issue_store.list_issue_files(data_dir)
+    return tuple((os.path.basename(path), os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in files)
+
+class RankingCache:
+    def __init__(self, data_dir, compact=False, check_interval=2.0, max_results=128, score_model=None, database=None):
+        self.data_dir = data_dir
+        # Ranking history recorded by dev_ranking_daily.py --database-url, queried directly rather than cached
+        self.database = database
+        self.compact = compact
+        self.score_model = score_model or SCORE_MODEL
+        self.check_interval = check_interval
+        self.max_results = max_results
+        self.lock = threading.Lock()
+        # One reload at a time; it runs without self.lock, so queries keep being answered from the previous data
+        self.reload_lock = threading.Lock()
+        self.reloading = False
+        self.checked_at = 0
+        # (data version, per-(developer, project) partials, projects, issue count, loaded at), replaced as a whole on
+        # reload; a query reads it once, so it never mixes data from two versions
+        self.current = None
+        self.results = OrderedDict()
+
+    @property
+    def projects(self):
+        return self.current[2]
+
+    @property
+    def loaded_at(self):
+        return self.current[4] if self.current is not None else None
+
+    def refresh(self, force=False):
+        # Once data is loaded, a change is picked up by a reload in a background thread; only the first load and a
+        # forced refresh wait for it
+        with self.lock:
+            current = self.current
+            now = time.monotonic()
+            if current is not None and not force and (self.reloading or now - self.checked_at < self.check_interval):
+                return
+            self.checked_at = now
+        try:
+            version = data_version(self.data_dir)
+        except FileNotFoundError:
+            # The extractor is swapping the data directory; keep serving the previous data meanwhile
+            if current is not None:
+                return
+            raise
+        if current is not None and version == current[0] and not force:
+            return
+        if current is None or force:
+            self.reload(version, force)
+            return
+        with self.lock:
+            if self.reloading:
+                return
+            self.reloading = True
+        threading.Thread(target=self.reload_in_background, args=(version,), daemon=True).start()
+
+    def reload(self, version, force=False):
+        with self.reload_lock:
+            if not force and self.current is not None and self.current[0] == version:
+                # Loaded by a concurrent caller while this one waited
+                return
+            start = time.perf_counter()
+            issues = DeveloperRanking(self.data_dir, compact=self.compact, score_model=self.score_model).issues_data
+            partials = aggregate_project_partials(issues)
+            projects = sorted(partials.index.get_level_values('Project').unique())
+            current = (version, partials, projects, len(issues), pd.Timestamp.now(tz='UTC').isoformat())
+            with self.lock:
+                self.current = current
+                self.results.clear()
+            logging.info(f"Loaded {len(issues)} issues from {self.data_dir} in {time.perf_counter() - start:.2f}s")
+
+    def reload_in_background(self, version):
+        try:
+            self.reload(version)
+        except Exception as e:
+            logging.error(f"Reloading {self.data_dir} failed, serving the previous data: {str(e)}")
+        finally:
+            with self.lock:
+                self.reloading = False
+
+    def rankings(self, projects=None, weights=None, current=None):
+        # Rankings for a set of projects and score weights, memoized until the data changes
+        if current is None:
+            self.refresh()
+            current = self.current
+        version, partials = current[:2]
+        projects = tuple(sorted(set(projects))) if projects else ()
+        unknown = set(weights or {}) - set(self.score_model.weights)
+        if unknown:
+            raise QueryError(f"Unknown weights: {sorted(unknown)}; expected any of {list(self.score_model.weights)}")
+        key = (version, projects, tuple(sorted((weights or {}).items())))
+        with self.lock:
+            if key in self.results:
+                self.results.move_to_end(key)
+                return self.results[key]
+
+        if projects:
+            partials = partials[partials.index.get_level_values('Project').isin(projects)]
+        partials = partials.groupby(level='Developer')[METRIC_REGISTRY.partial_columns].sum()
+        rankings = finalize_metrics(partials.loc[eligible_developers(partials)])
+        rankings.index.name = 'Name'
+        rankings = rankings.reset_index()
+        rankings.insert(1, 'Email', rankings['Name'].map(developer_email))
+        rankings['TotalScore'] = score_rankings(rankings, self.score_model, weights)
+        rankings = rankings.sort_values('TotalScore', ascending=False)
+        rankings['Rank'] = range(1, len(rankings) + 1)
+        rankings = rankings[ranking_columns()].reset_index(drop=True)
+
+        with self.lock:
+            self.results[key] = rankings
+            while len(self.results) > self.max_results:
+                self.results.popitem(last=False)
+        return rankings
+
+    def developer(self, name, weights=None):
+        self.refresh()
+        current = self.current
+        overall = self.rankings(weights=weights, current=current)
+        partials = current[1]
+        if name not in partials.index.get_level_values('Developer'):
+            return None
+        row = overall[overall['Name'] == name]
+        per_project = finalize_metrics(partials.loc[name]).reset_index()
+        return {
+            'name': name,
+            'ranking': records(row)[0] if len(row) else None,
+            'projects': records(per_project),
+        }
+
+    def status(self):
+        self.refresh()
+        version, partials, projects, issue_count, loaded_at = self.current
+        return {
+            'data_dir': self.data_dir,
+            'loaded_at': loaded_at,
+            'issue_files': len(version),
+            'issues': issue_count,
+            'developers': int(partials.index.get_level_values('Developer').nunique()),
+            'projects': len(projects),
+            'cached_queries': len(self.results),
+        }
+
+def records(df):
+    df = df.replace([np.inf, -np.inf], np.nan).astype(object)
+    return df.where(df.notna(), None).to_dict('records')
+
+def parse_query(query):
+    projects = [project for value in query.get('project', []) for project in value.split(',') if project]
+    weights = {}
+    for name, values in query.items():
+        if name.startswith('weight.'):
+            try:
+                weights[name[len('weight.'):]] = float(values[-1])
+            except ValueError:
+                raise QueryError(f"Weight {name} must be a number")
+    try:
+        top = int(query['top'][-1]) if 'top' in query else None
+        min_score = float(query['min_score'][-1]) if 'min_score' in query else None
+        max_score = float(query['max_score'][-1]) if 'max_score' in query else None
+    except ValueError:
+        raise QueryError("top, min_score and max_score must be numbers")
+    developers = [name for value in query.get('developer', []) for name in value.split(',') if name]
+    return projects, weights, top, min_score, max_score, developers
+
+def make_handler(cache):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload, default=str).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            start = time.perf_counter()
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            try:
+                if url.path == '/rankings':
+                    projects, weights, top, min_score, max_score, developers = parse_query(query)
+                    rankings = cache.rankings(projects, weights)
+                    if developers:
+                        rankings = rankings[rankings['Name'].isin(developers)]
+                    if min_score is not None:
+                        rankings = rankings[rankings['TotalScore'] >= min_score]
+                    if max_score is not None:
+                        rankings = rankings[rankings['TotalScore'] <= max_score]
+                    if top is not None:
+                        rankings = rankings.head(top)
+                    payload = {'projects': projects, 'weights': {**cache.score_model.weights, **weights},
+                               'count': len(rankings), 'rankings': records(rankings)}
+                elif url.path.startswith('/developers/'):
+                    _, weights, _, _, _, _ = parse_query(query)
+                    payload = cache.developer(unquote(url.path[len('/developers/'):]), weights)
+                    if payload is None:
+                        self.send_json(404, {'error': 'Unknown developer'})
+                        return
+                elif url.path in ('/history', '/runs'):
+                    if cache.database is None:
+                        self.send_json(404, {'error': 'No ranking history; start the service with --database-url'})
+                        return
+                    if url.path == '/runs':
+                        payload = {'runs': records(cache.database.runs())}
+                    else:
+                        developers = [name for value in query.get('developer', []) for name in value.split(',') if name]
+                        try:
+                            since = pd.Timestamp(query['since'][-1]) if 'since' in query else None
+                        except ValueError:
+                            raise QueryError("since must be a date")
+                        metric = query['metric'][-1] if 'metric' in query else None
+                        history = cache.database.rank_history(developers, since, metric)
+                        payload = {'developers': developers, 'history': records(history)}
+                elif url.path == '/projects':
+                    cache.refresh()
+                    payload = {'projects': cache.projects}
+                elif url.path == '/status':
+                    payload = cache.status()
+                else:
+                    self.send_json(404, {'error': f'Unknown path {url.path}'})
+                    return
+            except QueryError as e:
+                self.send_json(400, {'error': str(e)})
+                return
+            except Exception as e:
+                logging.error(f"Error answering {self.path}: {str(e)}")
+                self.send_json(500, {'error': str(e)})
+                return
+            payload['version'] = cache.loaded_at
+            payload['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            self.send_json(200, payload)
+
+    return Handler
+
+def make_server(cache, host='127.0.0.1', port=8050):
+    return ThreadingHTTPServer((host, port), make_handler(cache))
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve developer ranking queries over local HTTP/JSON")
+    parser.add_argument('--data-dir', default='jira_data_daily')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--compact', action='store_true',
+                        help="Load issues into a dictionary-encoded, compact-dtype table")
+    parser.add_argument('--check-interval', type=float, default=2.0,
+                        help="Seconds between checks of the data directory for new extracted data")
+    parser.add_argument('--score-config', default=None, metavar='JSON_FILE',
+                        help="Score terms and weights overriding the built-in score (see README)")
+    parser.add_argument('--metric-plugins', nargs='+', default=[], metavar='MODULE',
+                        help="Modules registering extra metrics on import")
+    parser.add_argument('--database-url', default=None, metavar='URL',
+                        help="Database with the ranking history (dev_ranking_daily.py --database-url) for /history")
+    args = parser.parse_args()
+
+    load_plugins(METRIC_REGISTRY, args.metric_plugins)
+    score_model = SCORE_MODEL.load(args.score_config) if args.score_config else SCORE_MODEL
+    score_model.check_columns(METRIC_REGISTRY.metric_columns)
+    database = None
+    if args.database_url:
+        from issue_db import IssueDatabase
+
+        database = IssueDatabase(args.database_url)
+    cache = RankingCache(args.data_dir, compact=args.compact, check_interval=args.check_interval,
+                         score_model=score_model, database=database)
+    cache.refresh()
+    server = make_server(cache, args.host, args.port)
+    logging.info(f"Ranking service listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import cProfile
+import json
+import logging
+import os
+import platform
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Per-run observability for the extraction and ranking jobs: wall time and memory per stage, HTTP requests per
+# project, retries and rate-limit waits, written as one JSON document per run so CI can archive and trend them.
+
+def max_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 ** 2 if platform.system() == 'Darwin' else 1024), 2)
+
+def latency_summary(seconds):
+    if not seconds:
+        return None
+    ms = np.asarray(seconds) * 1000
+    return {
+        'mean': round(float(ms.mean()), 2),
+        'p50': round(float(np.percentile(ms, 50)), 2),
+        'p95': round(float(np.percentile(ms, 95)), 2),
+        'max': round(float(ms.max()), 2),
+    }
+
+class RunMetrics:
+    def __init__(self, job, trace_memory=False):
+        self.job = job
+        self.trace_memory = trace_memory
+        self.started_at = datetime.now(timezone.utc)
+        self.status = 'running'
+        self.stages = {}
+        self.counters = {}
+        self.projects = {}
+        self.retries = {}
+        self.latencies = []
+        self.rate_limit_wait = 0.0
+        self.rate_limit_waiters = 0
+        self.rate_limit_wait_started = None
+        self.profile = None
+        self.top_allocations = None
+        self.lock = threading.Lock()
+        # Peak traced memory of the enclosing stages, so a nested stage resetting the peak does not lose theirs
+        self.peak_stack = []
+
+    @contextmanager
+    def stage(self, name):
+        # Stages entered more than once (e.g. a metric computed per developer) accumulate seconds and calls
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            if self.peak_stack:
+                self.peak_stack[-1] = max(self.peak_stack[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self.peak_stack.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            entry = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            entry['seconds'] += seconds
+            entry['calls'] += 1
+            if tracing:
+                peak = max(self.peak_stack.pop(), tracemalloc.get_traced_memory()[1])
+                if self.peak_stack:
+                    self.peak_stack[-1] = max(self.peak_stack[-1], peak)
+                entry['peak_mb'] = max(entry.get('peak_mb', 0), round(peak / 1024 ** 2, 2))
+            entry['max_rss_mb'] = max_rss_mb()
+
+    def add(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_project(self, project, **values):
+        with self.lock:
+            entry = self.projects.setdefault(project, {})
+            for name, value in values.items():
+                entry[name] = entry.get(name, 0) + value
+
+    def record_request(self, seconds, size, status, project=None):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.counters['requests'] = self.counters.get('requests', 0) + 1
+            self.counters['response_bytes'] = self.counters.get('response_bytes', 0) + size
+            if status >= 400:
+                self.counters['failed_requests'] = self.counters.get('failed_requests', 0) + 1
+        if project is not None:
+            self.add_project(project, requests=1, bytes=size, request_seconds=seconds,
+                             pages=1 if status < 400 else 0)
+
+    def record_retry(self, status):
+        with self.lock:
+            self.retries[str(status)] = self.retries.get(str(status), 0) + 1
+
+    @contextmanager
+    def rate_limit_wait_time(self):
+        # Wall time during which at least one request is held back by the rate limit; overlapping waits of
+        # concurrent threads or coroutines are counted once, so the total stays comparable with the run's seconds
+        with self.lock:
+            if self.rate_limit_waiters == 0:
+                self.rate_limit_wait_started = time.perf_counter()
+            self.rate_limit_waiters += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.rate_limit_waiters -= 1
+                if self.rate_limit_waiters == 0:
+                    self.rate_limit_wait += time.perf_counter() - self.rate_limit_wait_started
+
+    def report(self):
+        finished_at = datetime.now(timezone.utc)
+        seconds = (finished_at - self.started_at).total_seconds()
+        report = {
+            'job': self.job,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': finished_at.isoformat(),
+            'seconds': round(seconds, 4),
+            'python': platform.python_version(),
+            'host': platform.node(),
+            'max_rss_mb': max_rss_mb(),
+            'stages': {name: {**entry, 'seconds': round(entry['seconds'], 4)} for name, entry in self.stages.items()},
+            'counters': dict(self.counters),
+        }
+        if 'issues' in self.counters and seconds:
+            report['issues_per_second'] = round(self.counters['issues'] / seconds, 2)
+        if self.latencies:
+            report['request_latency_ms'] = latency_summary(self.latencies)
+            report['retries'] = dict(self.retries)
+            report['rate_limit_wait_seconds'] = round(self.rate_limit_wait, 4)
+        if self.projects:
+            report['projects'] = {
+                project: {name: round(value, 4) if isinstance(value, float) else value for name, value in entry.items()}
+                for project, entry in sorted(self.projects.items())
+            }
+        if self.profile is not None:
+            report['profile'] = self.profile
+        if self.top_allocations is not None:
+            report['top_allocations'] = self.top_allocations
+        return report
+
+    def write(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        os.replace(f'{path}.tmp', path)
+        logging.info(f"Run metrics saved to {path}")
+
+    def log_summary(self):
+        for name, entry in self.stages.items():
+            memory = f" peak {entry['peak_mb']:.1f} MB" if 'peak_mb' in entry else ''
+            logging.info(f"{self.job} stage {name}: {entry['seconds']:.3f}s in {entry['calls']} call(s){memory}")
+
+def profile_summary(profiler, limit=25):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({'function': f'{os.path.basename(filename)}:{line}({function})', 'calls': calls,
+                     'total_seconds': round(total, 4), 'cumulative_seconds': round(cumulative, 4)})
+    return sorted(rows, key=lambda row: row['cumulative_seconds'], reverse=True)[:limit]
+
+def allocation_summary(limit=25):
+    snapshot = tracemalloc.take_snapshot()
+    return [{'location': str(stat.traceback), 'size_mb': round(stat.size / 1024 ** 2, 3), 'blocks': stat.count}
+            for stat in snapshot.statistics('lineno')[:limit]]
+
+@contextmanager
+def instrumented_run(job, metrics_file, profile_file=None, trace_memory=False):
+    # Wraps a whole job: the metrics file is written even when the job fails. cProfile (profile_file) and
+    # tracemalloc (trace_memory) are opt-in since both slow Python-heavy code down.
+    metrics = RunMetrics(job, trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile_file else None
+    if profiler:
+        profiler.enable()
+    try:
+        with metrics.stage('total'):
+            yield metrics
+        metrics.status = 'succeeded'
+    except BaseException:
+        metrics.status = 'failed'
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+            metrics.profile = profile_summary(profiler)
+            logging.info(f"Profile saved to {profile_file}")
+        if trace_memory:
+            metrics.top_allocations = allocation_summary()
+            tracemalloc.stop()
+        metrics.log_summary()
+        metrics.write(metrics_file)
+
+def add_arguments(parser, job):
+    parser.add_argument('--metrics-file', default=f'{job}_metrics.json',
+                        help=f"Where to write this run's timing and memory metrics (default: {job}_metrics.json)")
+    parser.add_argument('--profile', default=None, metavar='PROF_FILE',
+                        help="Run under cProfile and dump the stats here; the top functions also go into the metrics")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Trace allocations with tracemalloc for per-stage peak memory and the top allocation sites")
@@ -1,49 +1,42 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime
 import requests
-from io import StringIO
+import dashboard_data
 
 # Set page config
 st.set_page_config(page_title="KiwiTech Developer Rankings", page_icon="🏆", layout="wide")
 
-# Function to load the CSV file from GitHub
-@st.cache_data(ttl=3600)  # Cache for 1 hour
-def load_data():
+# One snapshot store per server process, shared by every session: the rankings are re-read (conditionally,
+# for remote sources) at most every few minutes and the chart aggregates are computed once per snapshot version
+@st.cache_resource
+def get_snapshot_store():
+    return dashboard_data.SnapshotStore(dashboard_data.source_from_env())
+
+def load_data(force=False):
     try:
-        github_csv_url = "https://raw.githubusercontent.com/syedzaidi-kiwi/jira-developer-ranking/main/developer_rankings_final.csv"
-        response = requests.get(github_csv_url)
-        response.raise_for_status()  # Raise an exception for bad responses
-        
-        csv_content = StringIO(response.text)
-        df = pd.read_csv(csv_content)
-        
-        # Convert 'TotalScore' to numeric, replacing any non-numeric values with NaN
-        df['TotalScore'] = pd.to_numeric(df['TotalScore'], errors='coerce')
-        # Drop rows where 'TotalScore' is NaN
-        df = df.dropna(subset=['TotalScore'])
-        
-        last_updated = datetime.now()
-        return df, last_updated
+        snapshot = get_snapshot_store().current(force=force)
+        return snapshot, snapshot.generated_at
     except requests.RequestException as e:
         st.error(f"Error fetching data from GitHub: {str(e)}")
     except pd.errors.EmptyDataError:
         st.error("The CSV file is empty.")
     except Exception as e:
         st.error(f"An unexpected error occurred: {str(e)}")
-    
+
     return None, None
 
 # Load the data
-df, last_updated = load_data()
+snapshot, last_updated = load_data()
 
 # Title
 st.title('🏆 KiwiTech Developer Rankings')
 
-if df is not None and not df.empty:
-    # Display last updated time
-    st.write(f"Last updated: {last_updated}")
+if snapshot is not None and not snapshot.empty:
+    df = snapshot.df
+
+    # Display when the rankings were generated
+    st.write(f"Last updated: {last_updated if last_updated else 'unknown'}")
 
     # Add filters
     st.sidebar.header("Filters")
@@ -51,23 +44,20 @@ if df is not None and not df.empty:
     # Filter by developer name
     selected_developers = st.sidebar.multiselect(
         "Select Developers",
-        options=df['Name'].unique(),
+        options=snapshot.names,
         default=[]
     )
 
     # Filter by total score range
     score_range = st.sidebar.slider(
         "Total Score Range",
-        float(df['TotalScore'].min()),
-        float(df['TotalScore'].max()),
-        (float(df['TotalScore'].min()), float(df['TotalScore'].max()))
+        snapshot.score_range[0],
+        snapshot.score_range[1],
+        snapshot.score_range
     )
 
     # Apply filters
-    filtered_df = df
-    if selected_developers:
-        filtered_df = filtered_df[filtered_df['Name'].isin(selected_developers)]
-    filtered_df = filtered_df[(filtered_df['TotalScore'] >= score_range[0]) & (filtered_df['TotalScore'] <= score_range[1])]
+    filtered_df = snapshot.filter(selected_developers, score_range)
 
     # Display the rankings table (excluding BugTime and AvgCompletionTime)
     st.subheader("Developer Rankings")
@@ -75,7 +65,7 @@ if df is not None and not df.empty:
     st.data_editor(filtered_df[display_columns], hide_index=True, num_rows="fixed")
 
     # Create a bar chart of top 10 developers by TotalScore
-    top_10 = filtered_df.nlargest(10, 'TotalScore')
+    top_10 = snapshot.top(filtered_df, 10)
     fig = px.bar(top_10, x='Name', y='TotalScore', title='Top 10 Developers by Total Score')
     st.plotly_chart(fig)
 
@@ -84,12 +74,12 @@ if df is not None and not df.empty:
     st.plotly_chart(fig2)
 
     # Create a pie chart of project time vs bench time
-    time_data = filtered_df[['ProjectTime', 'BenchTime']].sum()
+    time_data = snapshot.time_distribution(filtered_df)
     fig3 = px.pie(values=time_data.values, names=time_data.index, title='Project Time vs Bench Time Distribution')
     st.plotly_chart(fig3)
 
     # Add a new chart: Average Completion Time by Developer
-    avg_completion_time = filtered_df.groupby('Name')['AvgCompletionTime'].mean().sort_values(ascending=False)
+    avg_completion_time = snapshot.completion_times(filtered_df)
     fig4 = px.bar(avg_completion_time, title='Average Completion Time by Developer')
     st.plotly_chart(fig4)
 
@@ -98,11 +88,11 @@ else:
 
 # Add a button to manually refresh the data
 if st.sidebar.button('Refresh Data'):
-    st.cache_data.clear()
+    load_data(force=True)
     st.experimental_rerun()
 
 # Information about auto-refresh
-st.sidebar.info("This page will auto-refresh every 60 minutes to show the latest data.")
+st.sidebar.info("New rankings are picked up automatically within a few minutes of being published.")
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,193 @@
+import pandas as pd
+import numpy as np
+import os
+import argparse
+import logging
+import issue_store
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Writes <PROJECT>_issues.csv files with the same columns as the extractor's json_normalize output, with
+# distributions loosely fitted to the jira_data_daily snapshot, at any scale.
+
+BASE_URL = 'https://example.atlassian.net'
+COLUMNS = [
+    'expand', 'id', 'self', 'key', 'fields.issuetype.self', 'fields.issuetype.id', 'fields.issuetype.description',
+    'fields.issuetype.iconUrl', 'fields.issuetype.name', 'fields.issuetype.subtask', 'fields.issuetype.avatarId',
+    'fields.issuetype.hierarchyLevel', 'fields.creator.self', 'fields.creator.accountId', 'fields.creator.emailAddress',
+    'fields.creator.avatarUrls.48x48', 'fields.creator.avatarUrls.24x24', 'fields.creator.avatarUrls.16x16',
+    'fields.creator.avatarUrls.32x32', 'fields.creator.displayName', 'fields.creator.active', 'fields.creator.timeZone',
+    'fields.creator.accountType', 'fields.timespent', 'fields.resolutiondate', 'fields.created',
+    'fields.timeoriginalestimate', 'fields.project.self', 'fields.project.id', 'fields.project.key',
+    'fields.project.name', 'fields.project.projectTypeKey', 'fields.project.simplified',
+    'fields.project.avatarUrls.48x48', 'fields.project.avatarUrls.24x24', 'fields.project.avatarUrls.16x16',
+    'fields.project.avatarUrls.32x32', 'fields.project.projectCategory.self', 'fields.project.projectCategory.id',
+    'fields.project.projectCategory.description', 'fields.project.projectCategory.name', 'fields.priority.self',
+    'fields.priority.iconUrl', 'fields.priority.name', 'fields.priority.id', 'fields.updated'
+]
+
+# name, share of issues, id, subtask, hierarchy level
+ISSUE_TYPES = [
+    ('Story', 0.36, 10001, False, 0), ('Sub-task', 0.31, 10003, True, -1), ('Test', 0.175, 10010, False, 0),
+    ('Bug', 0.11, 10004, False, 0), ('Iterative Refinement', 0.023, 10011, False, 0), ('Epic', 0.018, 10000, False, 1),
+    ('Task', 0.004, 10002, False, 0)
+]
+# name, share of issues, id
+PRIORITIES = [
+    ('Lowest', 0.78, 5), ('Low', 0.09, 4), ('Medium', 0.02, 3), ('High', 0.07, 2), ('Highest', 0.025, 1),
+    ('Must Have', 0.005, 10000), ('Nice To Have', 0.01, 10001)
+]
+TIMESPENT_MISSING = 0.4
+ESTIMATE_MISSING = 0.57
+UTC_OFFSET = pd.Timedelta(hours=5, minutes=30)
+
+def weights(shares):
+    shares = np.asarray(shares, dtype='float64')
+    return shares / shares.sum()
+
+def format_timestamps(values):
+    # Same text the extractor's CSVs carry, e.g. 2024-07-22 18:49:05.202000+05:30
+    local = pd.Series(values + UTC_OFFSET)
+    text = local.dt.strftime('%Y-%m-%d %H:%M:%S.%f+05:30')
+    return text.where(local.notna(), np.nan).to_numpy(dtype=object)
+
+def developer_table(count):
+    index = np.arange(count)
+    names = np.array([f'Developer {i:05d}' for i in index], dtype=object)
+    account_ids = np.array([f'{i:024x}' for i in index], dtype=object)
+    avatar = np.array([f'https://secure.gravatar.com/avatar/{i:032x}?d=initials' for i in index], dtype=object)
+    return {
+        'fields.creator.self': np.array([f'{BASE_URL}/rest/api/2/user?accountId={a}' for a in account_ids], dtype=object),
+        'fields.creator.accountId': account_ids,
+        'fields.creator.emailAddress': np.array([f'developer.{i:05d}@example.com' for i in index], dtype=object),
+        'fields.creator.avatarUrls.48x48': avatar,
+        'fields.creator.avatarUrls.24x24': avatar,
+        'fields.creator.avatarUrls.16x16': avatar,
+        'fields.creator.avatarUrls.32x32': avatar,
+        'fields.creator.displayName': names,
+    }
+
+def generate_project_issues(project_key, project_number, count, team, developers, first_id, first_number, start, days,
+                            resolved_ratio, rng):
+    # Developer activity within a team is skewed: a few people create most of the issues
+    creator = team[rng.choice(len(team), size=count, p=weights(1 / np.arange(1, len(team) + 1) ** 0.8))]
+    issue_type = rng.choice(len(ISSUE_TYPES), size=count, p=weights([t[1] for t in ISSUE_TYPES]))
+    priority = rng.choice(len(PRIORITIES), size=count, p=weights([p[1] for p in PRIORITIES]))
+
+    timespent = np.round(rng.lognormal(np.log(14400), 1.3, size=count) / 900) * 900
+    timespent = np.minimum(timespent, 3830400)
+    timespent[rng.random(count) < TIMESPENT_MISSING] = np.nan
+    estimate = np.round(rng.lognormal(np.log(14400), 1.0, size=count) / 1800) * 1800
+    estimate[rng.random(count) < ESTIMATE_MISSING] = np.nan
+
+    created = start + pd.to_timedelta(rng.random(count) * days * 86400, unit='s').to_numpy()
+    completion = pd.to_timedelta(rng.lognormal(np.log(48), 1.5, size=count) * 3600, unit='s').to_numpy()
+    resolved = created + completion
+    resolved[rng.random(count) >= resolved_ratio] = np.datetime64('NaT')
+    updated = created + (completion * rng.random(count)).astype(completion.dtype)
+    updated = np.where(np.isnat(resolved), updated, resolved)
+
+    ids = np.arange(first_id, first_id + count)
+    numbers = np.arange(first_number, first_number + count)
+    type_names = np.array([t[0] for t in ISSUE_TYPES], dtype=object)
+    type_ids = np.array([t[2] for t in ISSUE_TYPES])
+    priority_ids = np.array([p[2] for p in PRIORITIES])
+    project_id = 10000 + project_number
+    project_avatar = f'{BASE_URL}/rest/api/2/universal_avatar/view/type/project/avatar/{10400 + project_number}'
+
+    columns = {
+        'expand': 'operations,versionedRepresentations,editmeta,changelog,renderedFields',
+        'id': ids,
+        'self': np.char.add(f'{BASE_URL}/rest/api/2/issue/', ids.astype(str)).astype(object),
+        'key': np.char.add(f'{project_key}-', numbers.astype(str)).astype(object),
+        'fields.issuetype.self': np.char.add(f'{BASE_URL}/rest/api/2/issuetype/', type_ids[issue_type].astype(str)).astype(object),
+        'fields.issuetype.id': type_ids[issue_type],
+        'fields.issuetype.description': np.array([f'{t[0]} issues' for t in ISSUE_TYPES], dtype=object)[issue_type],
+        'fields.issuetype.iconUrl': np.char.add(f'{BASE_URL}/rest/api/2/universal_avatar/view/type/issuetype/avatar/', type_ids[issue_type].astype(str)).astype(object),
+        'fields.issuetype.name': type_names[issue_type],
+        'fields.issuetype.subtask': np.array([t[3] for t in ISSUE_TYPES])[issue_type],
+        'fields.issuetype.avatarId': (type_ids[issue_type] + 300).astype('float64'),
+        'fields.issuetype.hierarchyLevel': np.array([t[4] for t in ISSUE_TYPES])[issue_type],
+        'fields.creator.active': True,
+        'fields.creator.timeZone': 'Asia/Calcutta',
+        'fields.creator.accountType': 'atlassian',
+        'fields.timespent': timespent,
+        'fields.resolutiondate': format_timestamps(resolved),
+        'fields.created': format_timestamps(created),
+        'fields.timeoriginalestimate': estimate,
+        'fields.project.self': f'{BASE_URL}/rest/api/2/project/{project_id}',
+        'fields.project.id': project_id,
+        'fields.project.key': project_key,
+        'fields.project.name': f'Synthetic project {project_key}',
+        'fields.project.projectTypeKey': 'software',
+        'fields.project.simplified': False,
+        'fields.project.avatarUrls.48x48': project_avatar,
+        'fields.project.avatarUrls.24x24': f'{project_avatar}?size=small',
+        'fields.project.avatarUrls.16x16': f'{project_avatar}?size=xsmall',
+        'fields.project.avatarUrls.32x32': f'{project_avatar}?size=medium',
+        'fields.project.projectCategory.self': f'{BASE_URL}/rest/api/2/projectCategory/10000',
+        'fields.project.projectCategory.id': 10000.0,
+        'fields.project.projectCategory.description': 'For all ODC projects',
+        'fields.project.projectCategory.name': 'Team Based',
+        'fields.priority.self': np.char.add(f'{BASE_URL}/rest/api/2/priority/', priority_ids[priority].astype(str)).astype(object),
+        'fields.priority.iconUrl': np.array([f'{BASE_URL}/images/icons/priorities/{p[0].lower()}.svg' for p in PRIORITIES], dtype=object)[priority],
+        'fields.priority.name': np.array([p[0] for p in PRIORITIES], dtype=object)[priority],
+        'fields.priority.id': priority_ids[priority],
+        'fields.updated': format_timestamps(updated),
+    }
+    for col, values in developers.items():
+        columns[col] = values[creator]
+    return pd.DataFrame(columns, index=np.arange(count))[COLUMNS]
+
+def project_sizes(issues, projects, rng):
+    # A few large projects (like IMGWEB or MVOHYB) and a long tail of small ones
+    return rng.multinomial(issues, weights(1 / np.arange(1, projects + 1) ** 0.9))
+
+def generate_dataset(output_dir, issues=10000, developers=100, projects=20, days=365, end='2024-07-31',
+                     resolved_ratio=0.6, team_size=25, storage_format='csv', chunk_size=200000, seed=0):
+    rng = np.random.default_rng(seed)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    developer_columns = developer_table(developers)
+    start = np.datetime64(pd.Timestamp(end) - pd.Timedelta(days=days), 'us')
+    next_id = 100000
+    written = 0
+    for project_number, count in enumerate(project_sizes(issues, projects, rng)):
+        project_key = f'SYN{project_number:04d}'
+        team = rng.choice(developers, size=min(team_size, developers), replace=False)
+        writer = issue_store.IssueFileWriter(project_key, output_dir, 'parquet') if storage_format in ('parquet', 'both') else None
+        csv_path = os.path.join(output_dir, f'{project_key}{issue_store.CSV_SUFFIX}')
+        for offset in range(0, count, chunk_size):
+            chunk = generate_project_issues(project_key, project_number, min(chunk_size, count - offset), team,
+                                            developer_columns, next_id, offset + 1, start, days, resolved_ratio, rng)
+            next_id += len(chunk)
+            if storage_format in ('csv', 'both'):
+                chunk.to_csv(csv_path, mode='a' if offset else 'w', header=offset == 0, index=False)
+            if writer is not None:
+                writer.write(chunk)
+        if writer is not None:
+            writer.close()
+        written += count
+    logging.info(f"Generated {written} issues for {developers} developers across {projects} projects in {output_dir}")
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic JIRA issue files with the extractor's schema")
+    parser.add_argument('--output-dir', default='jira_data_synthetic')
+    parser.add_argument('--issues', type=int, default=10000)
+    parser.add_argument('--developers', type=int, default=100)
+    parser.add_argument('--projects', type=int, default=20)
+    parser.add_argument('--days', type=int, default=365, help="Length of the history the created dates span")
+    parser.add_argument('--end', default='2024-07-31', help="Last day of the generated history")
+    parser.add_argument('--resolved-ratio', type=float, default=0.6)
+    parser.add_argument('--team-size', type=int, default=25, help="Developers working on each project")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='csv')
+    parser.add_argument('--chunk-size', type=int, default=200000, help="Rows generated and written at a time")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate_dataset(args.output_dir, args.issues, args.developers, args.projects, args.days, args.end,
+                     args.resolved_ratio, args.team_size, args.format, args.chunk_size, args.seed)
+
+if __name__ == "__main__":
+    main()
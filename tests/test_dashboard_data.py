@@ -0,0 +1,45 @@
+import threading
+import time
+import pandas as pd
+from dashboard_data import SnapshotStore
+
+class BlockingSource:
+    # version() waits until the test lets it through, like a slow revalidation over the network
+    def __init__(self):
+        self.version_number = 1
+        self.release = threading.Event()
+        self.release.set()
+        self.calls = 0
+
+    def version(self):
+        self.calls += 1
+        self.release.wait(5)
+        return self.version_number
+
+    def load(self):
+        df = pd.DataFrame({'Name': ['Alice'], 'TotalScore': [float(self.version_number)], 'AvgCompletionTime': [1.0],
+                           'ProjectTime': [1.0], 'BenchTime': [1.0]})
+        return df, self.version_number, None
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_viewers_get_the_current_snapshot_while_it_is_revalidated():
+    source = BlockingSource()
+    store = SnapshotStore(source, check_interval=0)
+    first = store.current()
+    assert first.version == 1
+
+    source.release.clear()
+    source.version_number = 2
+    started = time.monotonic()
+    assert all(store.current() is first for _ in range(20))
+    assert time.monotonic() - started < 1
+    # Only one revalidation runs at a time
+    assert wait_for(lambda: source.calls == 2)
+
+    source.release.set()
+    assert wait_for(lambda: store.current().version == 2)
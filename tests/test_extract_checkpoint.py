@@ -0,0 +1,74 @@
+import os
+import sys
+import pandas as pd
+import pytest
+import issue_store
+import jira_extract_final
+import run_metrics
+from extract_checkpoint import ExtractionCheckpoint
+from fake_jira_server import FakeJiraServer
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    server = FakeJiraServer(projects=2, issues_per_project=250).start()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('JIRA_BASE_URL', server.base_url)
+    monkeypatch.setenv('JIRA_EMAIL', 'test')
+    monkeypatch.setenv('JIRA_API_TOKEN', 'test')
+    monkeypatch.setattr(sys, 'argv', ['jira_extract_final.py'])
+    yield server
+    server.stop()
+
+def run_extract(server, resume=False):
+    # The fake issues are older than the usual 5-day window, so a run resumes (or starts) a checkpoint without one
+    args = jira_extract_final.parse_args()
+    if not resume:
+        fields, expand = jira_extract_final.issue_request(args)
+        ExtractionCheckpoint.open(args.checkpoint_dir, {'fields': fields, 'expand': expand}, None)
+    server.searches.clear()
+    jira_extract_final.extract(args, run_metrics.RunMetrics('extract'))
+    return sorted(server.searches)
+
+def timespent(project_key):
+    issues = pd.read_csv(os.path.join('jira_data_daily', f'{project_key}_issues.csv'))
+    return issues.set_index('key')['fields.timespent']
+
+def test_failed_project_keeps_its_files_and_resumes_from_the_missing_pages(server):
+    run_extract(server)
+    previous = {key: timespent(key) for key in ('PRJ0', 'PRJ1')}
+    for project_key in ('PRJ0', 'PRJ1'):
+        server.projects[project_key][0]['fields']['timespent'] = 99999
+
+    server.fail_project('PRJ1', start_at=100)
+    run_extract(server)
+    assert timespent('PRJ0').iloc[0] == 99999
+    pd.testing.assert_series_equal(timespent('PRJ1'), previous['PRJ1'])
+    assert os.path.exists('jira_data_temp')
+
+    server.failures.clear()
+    assert run_extract(server, resume=True) == [('PRJ1', 100), ('PRJ1', 200)]
+    assert timespent('PRJ1').iloc[0] == 99999
+    assert len(timespent('PRJ1')) == 250
+    assert timespent('PRJ0').iloc[0] == 99999
+    assert not os.path.exists('jira_data_temp')
+
+def test_restore_directory_recovers_from_a_crash_between_the_renames(tmp_path, monkeypatch):
+    data_dir, new_dir = str(tmp_path / 'data'), str(tmp_path / 'data.new')
+    for directory, name in [(data_dir, 'old.csv'), (new_dir, 'new.csv')]:
+        os.makedirs(directory)
+        open(os.path.join(directory, name), 'w').close()
+
+    rename = os.rename
+    def crash_on_second_rename(source, target):
+        if source == new_dir:
+            raise OSError("crashed")
+        rename(source, target)
+    monkeypatch.setattr(os, 'rename', crash_on_second_rename)
+    with pytest.raises(OSError):
+        issue_store.replace_directory(new_dir, data_dir)
+    monkeypatch.setattr(os, 'rename', rename)
+    assert not os.path.exists(data_dir)
+
+    issue_store.restore_directory(data_dir)
+    assert os.listdir(data_dir) == ['old.csv']
+    assert not os.path.exists(f'{data_dir}.old')
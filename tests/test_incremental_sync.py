@@ -0,0 +1,13 @@
+import pandas as pd
+from jira_extract_final import latest_update, sync_start_date
+
+def test_latest_update_takes_the_newest_parseable_time():
+    issues = pd.DataFrame({'fields.updated': ['2024-07-01T10:00:00.000+0000', 'garbage', '2024-07-02T08:30:00.000+0000']})
+    assert latest_update(issues, None) == '2024-07-02T08:30:00+00:00'
+    assert latest_update(issues, '2024-08-01T00:00:00+00:00') == '2024-08-01T00:00:00+00:00'
+
+def test_unparseable_updated_times_keep_the_previous_mark():
+    issues = pd.DataFrame({'fields.updated': ['garbage', None]})
+    assert latest_update(issues, '2024-07-01T00:00:00+00:00') == '2024-07-01T00:00:00+00:00'
+    assert latest_update(issues, None) is None
+    assert sync_start_date(latest_update(issues, None), 'UTC') is None
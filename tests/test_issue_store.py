@@ -0,0 +1,48 @@
+import os
+import pandas as pd
+import issue_store
+from concurrent.futures import ThreadPoolExecutor
+
+def make_page(first_id, count):
+    return pd.DataFrame({
+        'id': [str(first_id + i) for i in range(count)],
+        'key': [f'ABC-{first_id + i}' for i in range(count)],
+        'fields.issuetype.name': ['Bug'] * count,
+        'fields.creator.displayName': ['Alice'] * count,
+        'fields.project.key': ['ABC'] * count,
+        'fields.priority.name': ['Low'] * count,
+        'fields.timespent': [3600] * count,
+        'fields.created': ['2024-07-01 09:00:00.000000+05:30'] * count,
+        'fields.updated': ['2024-07-02 09:00:00.000000+05:30'] * count,
+    })
+
+def test_writer_replaces_an_existing_file(tmp_path):
+    output_dir = str(tmp_path)
+    for first_id in (100, 200):
+        writer = issue_store.IssueFileWriter('ABC', output_dir)
+        writer.write(make_page(first_id, 3))
+        writer.write(make_page(first_id + 3, 2))
+        writer.close()
+    issues = pd.read_csv(os.path.join(output_dir, f'ABC{issue_store.CSV_SUFFIX}'), dtype=str)
+    assert issues['id'].tolist() == [str(i) for i in range(200, 205)]
+
+def test_abort_before_writing_keeps_an_existing_file(tmp_path):
+    output_dir = str(tmp_path)
+    writer = issue_store.IssueFileWriter('ABC', output_dir)
+    writer.write(make_page(100, 3))
+    writer.close()
+    issue_store.IssueFileWriter('ABC', output_dir).abort()
+    assert os.path.exists(os.path.join(output_dir, f'ABC{issue_store.CSV_SUFFIX}'))
+
+def test_writers_share_a_new_output_dir(tmp_path):
+    output_dir = str(tmp_path / 'new')
+
+    def write_project(number):
+        writer = issue_store.IssueFileWriter(f'P{number}', output_dir)
+        writer.write(make_page(number * 100, 2))
+        writer.close()
+        return writer.row_count
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert list(executor.map(write_project, range(16))) == [2] * 16
+    assert len(issue_store.list_issue_files(output_dir)) == 16
@@ -0,0 +1,10 @@
+import pytest
+from dev_ranking_daily import METRIC_REGISTRY, SCORE_MODEL
+
+def test_builtin_score_uses_registered_metrics():
+    SCORE_MODEL.check_columns(METRIC_REGISTRY.metric_columns)
+
+def test_score_config_with_unknown_metric_names_the_term():
+    score_model = SCORE_MODEL.with_config({'terms': {'DaysLogged': 'DaysLoged8Hours / 132'}})
+    with pytest.raises(ValueError, match=r"DaysLogged .*\['DaysLoged8Hours'\]"):
+        score_model.check_columns(METRIC_REGISTRY.metric_columns)
@@ -0,0 +1,53 @@
+import pandas as pd
+from dev_ranking_daily import normalize_dates
+from metric_state import MetricState
+
+def make_issues(bug_timespent=None):
+    # Alice has the five Sub-task/Bug issues needed to be ranked; only her first Sub-task has logged time, 3.5 hours,
+    # so DaysLogged8Hours is 0.4375 before rounding
+    issues = pd.DataFrame({
+        'id': ['101', '102', '103', '104', '105', '106'],
+        'fields.issuetype.name': ['Sub-task', 'Bug', 'Sub-task', 'Sub-task', 'Bug', 'Story'],
+        'fields.creator.displayName': ['Alice'] * 5 + ['Bob'],
+        'fields.project.key': ['ABC'] * 6,
+        'fields.priority.name': ['Low', 'High', 'Lowest', 'Low', 'Highest', 'Low'],
+        'fields.timespent': [12600.0, bug_timespent, None, None, None, 3600.0],
+        'fields.timeoriginalestimate': [14400.0, 3600.0, None, 7200.0, None, 7200.0],
+        'fields.created': ['2024-07-01 09:00:00.000000+05:30'] * 6,
+        'fields.resolutiondate': ['2024-07-03 17:20:00.000000+05:30', None, '2024-07-02 10:00:00.000000+05:30',
+                                  None, None, None],
+        'fields.updated': ['2024-07-03 17:20:00.000000+05:30'] * 6,
+    })
+    return normalize_dates(issues)
+
+def test_apply_from_scratch_then_update_matches_full_recompute(tmp_path):
+    issues = make_issues()
+    state = MetricState()
+    assert state.apply(issues) == 6
+    assert (state.totals.dtypes != object).all()
+    assert state.verify(issues)
+    assert state.metrics().loc['Alice', 'DaysLogged8Hours'] == 0.44
+
+    state.save(str(tmp_path))
+    state = MetricState.load(str(tmp_path))
+    updated = make_issues(bug_timespent=9000.0)
+    updated.loc[1, 'fields.updated'] = pd.Timestamp('2024-07-04 08:00:00')
+    assert state.apply(updated) == 1
+    assert state.verify(updated)
+    assert state.metrics().loc['Alice', 'BugTime'] == 2.5
+    assert state.apply(updated) == 0
+
+def test_deleted_issues_are_retracted():
+    issues = make_issues(bug_timespent=9000.0)
+    # A sixth Sub-task keeps Alice ranked once her Bug is deleted
+    issues = pd.concat([issues, issues.iloc[[2]].assign(id='107')], ignore_index=True)
+    state = MetricState()
+    state.apply(issues)
+
+    remaining = issues[~issues['id'].isin(['102', '106'])]
+    assert state.apply(remaining) == 2
+    assert list(state.contributions.index) == ['101', '103', '104', '105', '107']
+    assert state.verify(remaining)
+    assert list(state.metrics().index) == ['Alice']
+    assert state.totals.loc['Alice', 'BugSeconds'] == 0
+    assert 'Bob' not in state.totals.index
@@ -0,0 +1,39 @@
+import os
+import threading
+import time
+import pytest
+import ranking_service
+from synthetic_jira_data import generate_dataset
+
+@pytest.fixture
+def data_dir(tmp_path):
+    generate_dataset(str(tmp_path), issues=2000, developers=20, projects=3)
+    return str(tmp_path)
+
+def test_queries_are_answered_from_the_previous_data_during_a_reload(data_dir, monkeypatch):
+    cache = ranking_service.RankingCache(data_dir, check_interval=0)
+    cache.refresh()
+    before = cache.rankings()
+    version = cache.current[0]
+
+    release = threading.Event()
+    DeveloperRanking = ranking_service.DeveloperRanking
+    def slow_ranking(*args, **kwargs):
+        release.wait(5)
+        return DeveloperRanking(*args, **kwargs)
+    monkeypatch.setattr(ranking_service, 'DeveloperRanking', slow_ranking)
+
+    # New data lands: one project file is dropped
+    os.remove(os.path.join(data_dir, sorted(os.listdir(data_dir))[0]))
+    started = time.monotonic()
+    assert cache.rankings() is before
+    assert cache.developer(before['Name'][0])['ranking']['Rank'] == 1
+    assert cache.status()['issues'] == 2000
+    assert time.monotonic() - started < 1
+    assert cache.current[0] == version
+
+    release.set()
+    deadline = time.monotonic() + 10
+    while cache.current[0] == version and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.status()['issues'] < 2000
@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+from dev_ranking_daily import DeveloperRanking
+from synthetic_jira_data import generate_dataset
+
+@pytest.fixture(scope='module')
+def data_dir(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('issues'))
+    generate_dataset(path, issues=4000, developers=40, projects=5)
+    return path
+
+@pytest.fixture(scope='module')
+def reference(data_dir):
+    # The per-developer calculate_* methods and row-wise calculate_score
+    ranking = DeveloperRanking(data_dir, cache_dir=None)
+    ranking.rank_developers(vectorized=False)
+    return ranking.rankings.reset_index(drop=True)
+
+def ranked(data_dir, **options):
+    ranking = DeveloperRanking(data_dir, cache_dir=None, **options)
+    ranking.rank_developers()
+    return ranking.rankings.reset_index(drop=True)
+
+@pytest.mark.parametrize('options', [{}, {'compact': True}, {'workers': 2}], ids=['vectorized', 'compact', 'sharded'])
+def test_rankings_match_the_reference_path(data_dir, reference, options):
+    assert len(reference) > 10
+    pd.testing.assert_frame_equal(ranked(data_dir, **options), reference)
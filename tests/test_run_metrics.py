@@ -0,0 +1,14 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import run_metrics
+
+def test_overlapping_rate_limit_waits_count_once():
+    metrics = run_metrics.RunMetrics('extract')
+
+    def wait():
+        with metrics.rate_limit_wait_time():
+            time.sleep(0.2)
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        list(executor.map(lambda _: wait(), range(5)))
+    assert 0.2 <= metrics.rate_limit_wait < 0.5
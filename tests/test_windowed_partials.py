@@ -0,0 +1,37 @@
+import argparse
+import numpy as np
+import pandas as pd
+import pytest
+import dev_ranking_daily as ranking
+from synthetic_jira_data import generate_dataset
+
+def test_rolling_windows_match_a_per_window_recompute(tmp_path):
+    generate_dataset(str(tmp_path), issues=3000, developers=10, projects=3, days=400)
+    issues = ranking.DeveloperRanking(str(tmp_path), cache_dir='').issues_data
+    contributions = ranking.issue_contributions(issues)
+    times = ranking.parse_dates(issues.loc[contributions.index, 'fields.created'])
+    windows = ranking.rolling_windows(times.min(), times.max() + pd.Timedelta('1D'), '30D', '7D')
+
+    partials = ranking.windowed_partials(contributions, times, windows)
+    assert partials['WindowStart'].nunique() > 1
+    for start, end in windows:
+        window = partials[partials['WindowStart'] == np.datetime64(start)]
+        in_window = ((times >= start) & (times < end)).to_numpy()
+        expected = contributions[in_window].groupby('Developer', observed=True)[
+            ranking.METRIC_REGISTRY.partial_columns].sum()
+        expected.index = expected.index.astype(object)
+        expected = expected.loc[ranking.eligible_developers(expected)]
+        assert sorted(window.index) == sorted(expected.index)
+        actual = ranking.finalize_metrics(window[ranking.METRIC_REGISTRY.partial_columns]).sort_index()
+        pd.testing.assert_frame_equal(actual, ranking.finalize_metrics(expected).sort_index(), check_dtype=False,
+                                      check_names=False)
+
+@pytest.mark.parametrize('window', [('2024-01-01', '2024-01-01'), ('2024-02-01', '2024-01-01')])
+def test_empty_and_reversed_windows_are_rejected(window):
+    contributions = pd.DataFrame({'Developer': ['Alice'],
+                                  **{col: [1] for col in ranking.METRIC_REGISTRY.partial_columns}})
+    times = pd.Series(pd.to_datetime(['2024-01-01']))
+    with pytest.raises(ValueError, match='end after they start'):
+        ranking.windowed_partials(contributions, times, [window])
+    with pytest.raises(argparse.ArgumentTypeError):
+        ranking.parse_window(':'.join(window))
@@ -0,0 +1,82 @@
+import argparse
+import time
+from datetime import datetime, timezone
+import pandas as pd
+import pytest
+import issue_store
+import jira_extract_final
+from dev_ranking_daily import aggregate_partials, normalize_dates
+from fake_jira_server import FakeJiraServer, INLINE_WORKLOG_LIMIT, TIME_FORMAT
+
+@pytest.fixture
+def server():
+    server = FakeJiraServer(projects=1, issues_per_project=100).start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def jira(server):
+    return jira_extract_final.JiraDataExtractor(server.base_url, 'test', 'test')
+
+def fetch_with_activity(jira):
+    fields, expand = jira_extract_final.issue_request(argparse.Namespace(worklogs=True))
+    return jira.get_issues(jira_extract_final.project_jql('PRJ0', None), fields, project='PRJ0', expand=expand)
+
+def test_truncated_worklog_fetches_stop_at_the_cap(server, jira):
+    worklogs, _, truncated = jira_extract_final.split_activity(fetch_with_activity(jira))
+    assert len(truncated) > 2
+    assert all(len(server.worklogs[issue_id]) > INLINE_WORKLOG_LIMIT for issue_id in truncated)
+
+    requests_before = server.request_count
+    fetched = jira_extract_final.fetch_truncated_worklogs(jira, 'PRJ0', truncated, max_requests=2)
+    assert server.request_count - requests_before == 2
+    assert len(fetched) == sum(len(server.worklogs[issue_id]) for issue_id in truncated[:2])
+
+def test_sync_worklogs_upserts_changed_and_deletes_removed_worklogs(server, jira, tmp_path):
+    data_dir = str(tmp_path)
+    args = argparse.Namespace(worklogs=True, format='csv', max_worklog_requests=100)
+    jira_extract_final.save_activity(jira, {'project_key': 'PRJ0', 'issues': fetch_with_activity(jira)}, data_dir, args)
+    # The first sync only records where the next one starts
+    jira_extract_final.sync_worklogs(jira, data_dir, args, int(time.time() * 1000) - 60000)
+    baseline = issue_store.read_table(issue_store.WORKLOG_TABLE, data_dir).set_index('id')
+    assert len(baseline) == len(server.all_worklogs())
+
+    changed, deleted = server.all_worklogs()[:2]
+    changed['timeSpentSeconds'] = 12345
+    changed['updated'] = datetime.now(timezone.utc).strftime(TIME_FORMAT)
+    server.delete_worklog(deleted['id'])
+    added = server.add_worklog(changed['issueId'], 'Developer 7', 600)
+    jira_extract_final.sync_worklogs(jira, data_dir, args, None)
+
+    synced = issue_store.read_table(issue_store.WORKLOG_TABLE, data_dir).set_index('id')
+    assert len(synced) == len(baseline)
+    assert synced.loc[changed['id'], 'timeSpentSeconds'] == 12345
+    assert deleted['id'] not in synced.index
+    assert synced.loc[added['id'], 'author'] == 'Developer 7'
+
+def test_worklog_attribution_credits_each_authors_own_time():
+    issues = normalize_dates(pd.DataFrame({
+        'id': ['101', '102'],
+        'fields.issuetype.name': ['Bug', 'Sub-task'],
+        'fields.creator.displayName': ['Alice', 'Alice'],
+        'fields.project.key': ['ABC', 'ABC'],
+        'fields.priority.name': ['Low', 'Low'],
+        'fields.timespent': [7200.0, 3600.0],
+        'fields.timeoriginalestimate': [None, None],
+        'fields.created': ['2024-07-01 09:00:00+00:00'] * 2,
+        'fields.resolutiondate': [None, None],
+        'fields.updated': ['2024-07-02 09:00:00+00:00'] * 2,
+    }))
+    worklogs = pd.DataFrame({
+        'issueId': ['101', '101', '101'],
+        'author': ['Alice', 'Bob', 'Bob'],
+        'timeSpentSeconds': [1800, 3600, 1800],
+    })
+    partials = aggregate_partials(issues, worklogs)
+    assert partials.loc['Alice', 'BugSeconds'] == 1800
+    # Issue 102 has no worklogs, so its time stays with its creator
+    assert partials.loc['Alice', 'SubtaskSeconds'] == 3600
+    assert partials.loc['Bob', 'BugSeconds'] == 5400
+    assert partials.loc['Bob', 'SubtaskSeconds'] == 0
+    assert partials.loc['Bob', 'IssueCount'] == 1
+    assert partials.loc['Alice', 'IssueCount'] == 2